@@ -1,19 +1,322 @@
+import functools
+import glob
+import hashlib
+import json
+import asyncio
+import logging
+import math
 import operator
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pydantic import BaseModel, Field
-from typing import Annotated, List
+from collections import Counter
+from typing import Annotated, Any, Dict, List, Optional
 from typing_extensions import TypedDict
 
 from langchain_community.document_loaders import WikipediaLoader
 from langchain_community.tools.tavily_search import TavilySearchResults
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, get_buffer_string
+from langchain_core.rate_limiters import BaseRateLimiter
+from langchain_core.runnables import RunnableConfig
 from langchain_openai import ChatOpenAI
+import openai
 
 from langgraph.constants import Send
 from langgraph.graph import END, MessagesState, START, StateGraph
+from langgraph.types import RetryPolicy
+
+### LLM response cache
+
+# Message fields that differ between otherwise identical calls (ids, provider metadata, token counts)
+VOLATILE_MESSAGE_FIELDS = ("id", "response_metadata", "usage_metadata")
+
+def normalize_prompt(prompt: str) -> str:
+    """ Canonical form of a serialized message list, without volatile message fields """
+
+    def strip(value):
+        if isinstance(value, dict):
+            if value.get("lc") == 1 and isinstance(value.get("kwargs"), dict):
+                kwargs = {key: item for key, item in value["kwargs"].items()
+                          if key not in VOLATILE_MESSAGE_FIELDS}
+                if isinstance(kwargs.get("additional_kwargs"), dict):
+                    kwargs["additional_kwargs"] = {key: item for key, item
+                                                   in kwargs["additional_kwargs"].items()
+                                                   if item is not None}
+                # an empty field and a missing one send the same request
+                value = {**value, "kwargs": {key: item for key, item in kwargs.items()
+                                             if item != {} and item != []}}
+            return {key: strip(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [strip(item) for item in value]
+        return value
+
+    try:
+        return json.dumps(strip(json.loads(prompt)), sort_keys=True, separators=(",", ":"))
+    except ValueError:
+        return prompt
+
+class DiskLRUCache(BaseCache):
+
+    """ Content-addressed LLM response cache in a local SQLite file.
+
+    Entries are keyed by a hash of the model configuration (model name and
+    parameters, including any bound tools for structured output) and the
+    normalized messages. Once the stored responses exceed max_bytes, the least
+    recently used entries are evicted. """
+
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS responses ("
+                           "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                           "size INTEGER NOT NULL, last_used REAL NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\0{normalize_prompt(prompt)}".encode()).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = self.key(prompt, llm_string)
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+        return [loads(generation) for generation in json.loads(row[0])]
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        value = json.dumps([dumps(generation) for generation in return_val])
+        key = self.key(prompt, llm_string)
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                               (key, value, len(value), time.time()))
+            self._size += len(value) - (old[0] if old else 0)
+            self._evict()
+
+    def _evict(self) -> None:
+        # called with the lock held
+        while self._size > self.max_bytes:
+            oldest = self._conn.execute(
+                "SELECT key, size FROM responses ORDER BY last_used LIMIT 64").fetchall()
+            if not oldest:
+                break
+            for key, size in oldest:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._size -= size
+                if self._size <= self.max_bytes:
+                    break
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._size = 0
+
+# Shared by every node; set LLM_CACHE_PATH to an empty string to disable it
+llm_cache_path = os.environ.get("LLM_CACHE_PATH", ".llm_cache/responses.sqlite")
+llm_cache = DiskLRUCache(
+    llm_cache_path,
+    max_bytes=int(float(os.environ.get("LLM_CACHE_MAX_MB", "256")) * 1024 * 1024),
+) if llm_cache_path else None
+
+### Rate limiting
+
+class AdaptiveRateLimiter(BaseRateLimiter):
+
+    """ Token bucket shared by every LLM call, with additive-increase /
+    multiplicative-decrease rate control.
+
+    Requests start at up to requests_per_second (bursts of max_bucket_size).
+    A 429 halves the rate (not below min_requests_per_second) and holds the
+    bucket for the provider's retry-after; the rate then climbs back by
+    recovery requests/second (default a tenth of the full rate) for every
+    second without another 429. Cached responses do not take a token. """
+
+    def __init__(self, requests_per_second: float, max_bucket_size: float = 1,
+                 min_requests_per_second: float = 0.1, recovery: Optional[float] = None):
+        self.max_rate = requests_per_second
+        self.min_rate = min(min_requests_per_second, requests_per_second)
+        self.max_bucket_size = max_bucket_size
+        self.recovery = recovery if recovery is not None else requests_per_second / 10
+        self._lock = threading.Lock()
+        self._tokens = max_bucket_size
+        self._backoff_rate = requests_per_second  # rate right after the last 429
+        self._backoff_at = time.monotonic()
+        self._paused_until = 0.0
+        self._last_refill = time.monotonic()
+
+    @property
+    def rate(self) -> float:
+        return min(self.max_rate,
+                   self._backoff_rate + self.recovery * (time.monotonic() - self._backoff_at))
+
+    def _try_acquire(self) -> float:
+        """ Take a token if one is available; otherwise seconds to wait before trying again """
+        with self._lock:
+            now = time.monotonic()
+            rate = self.rate
+            self._tokens = min(self.max_bucket_size, self._tokens + rate * (now - self._last_refill))
+            self._last_refill = now
+            if now < self._paused_until:
+                return self._paused_until - now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / rate
+
+    def acquire(self, *, blocking: bool = True) -> bool:
+        while True:
+            wait = self._try_acquire()
+            if not wait:
+                return True
+            if not blocking:
+                return False
+            time.sleep(wait)
+
+    async def aacquire(self, *, blocking: bool = True) -> bool:
+        while True:
+            wait = self._try_acquire()
+            if not wait:
+                return True
+            if not blocking:
+                return False
+            await asyncio.sleep(wait)
+
+    def on_rate_limited(self, retry_after: Optional[float] = None) -> None:
+        """ Back off after a 429; 429s from requests already in flight during a backoff count once """
+        with self._lock:
+            now = time.monotonic()
+            pause = retry_after if retry_after is not None else 1 / max(self.rate, self.min_rate)
+            if now >= self._paused_until:
+                self._backoff_rate = max(self.min_rate, self.rate / 2)
+                self._backoff_at = now
+                self._tokens = 0
+            self._paused_until = max(self._paused_until, now + pause)
+
+def retry_after_seconds(error: openai.APIStatusError) -> Optional[float]:
+    headers = error.response.headers
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return None
+
+rate_limiter = AdaptiveRateLimiter(
+    requests_per_second=float(os.environ.get("LLM_REQUESTS_PER_SECOND", "5")),
+    max_bucket_size=float(os.environ.get("LLM_BURST", "5")),
+)
+
+def should_retry_llm_call(error: Exception) -> bool:
+    """ RetryPolicy.retry_on for LLM nodes: 429s (which also slow the limiter down), 5xx and connection errors """
+    if isinstance(error, openai.RateLimitError):
+        if error.code == "insufficient_quota":
+            return False
+        rate_limiter.on_rate_limited(retry_after_seconds(error))
+        return True
+    return isinstance(error, (openai.APIConnectionError, openai.InternalServerError))
+
+# Retries happen at the node, so every attempt goes through the rate limiter
+# (the OpenAI client's own retries would not); jittered backoff on top
+llm_retry_policy = RetryPolicy(initial_interval=0.5, backoff_factor=2.0, max_interval=30.0,
+                               max_attempts=int(os.environ.get("LLM_MAX_ATTEMPTS", "6")),
+                               retry_on=should_retry_llm_call)
 
 ### LLM
 
-llm = ChatOpenAI(model="gpt-4o", temperature=0) 
+llm = ChatOpenAI(model="gpt-4o", temperature=0, cache=llm_cache, rate_limiter=rate_limiter,
+                 max_retries=0)
+
+### Context store
+
+# Source documents gathered during an interview are kept once per source
+# (URL or Wikipedia page). Before each LLM call they are split into chunks,
+# ranked by relevance to the current question and packed into a token
+# budget, so prompts stop growing with the number of turns.
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", "3000"))
+CONTEXT_CHUNK_TOKENS = int(os.environ.get("CONTEXT_CHUNK_TOKENS", "300"))
+
+def terms(text: str) -> List[str]:
+    return re.findall(r"\w+", text.lower())
+
+def estimate_tokens(text: str) -> int:
+    """ Rough token count (about four characters per token), needs no tokenizer download """
+    return len(text) // 4 + 1
+
+def merge_context(existing: Optional[Dict[str, dict]], new) -> Dict[str, dict]:
+    """ Reducer for InterviewState.context: add documents keyed by source, keeping the first copy """
+    merged = dict(existing or {})
+    for doc in (new.values() if isinstance(new, dict) else new or []):
+        merged.setdefault(doc["source"], doc)
+    return merged
+
+def chunk_document(content: str, max_tokens: int) -> List[str]:
+    """ Split a document on blank lines into chunks of at most about max_tokens """
+    pieces = []
+    for paragraph in re.split(r"\n\s*\n", content):
+        # an oversized paragraph is cut at the last space before the limit
+        while estimate_tokens(paragraph) > max_tokens:
+            cut = paragraph.rfind(" ", 0, max_tokens * 4)
+            cut = cut if cut > 0 else max_tokens * 4
+            pieces.append(paragraph[:cut])
+            paragraph = paragraph[cut:].lstrip()
+        pieces.append(paragraph)
+    chunks, current = [], ""
+    for piece in pieces:
+        if current and estimate_tokens(current + "\n\n" + piece) > max_tokens:
+            chunks.append(current)
+            current = piece
+        else:
+            current = f"{current}\n\n{piece}" if current else piece
+    if current.strip():
+        chunks.append(current)
+    return chunks
+
+def format_document(doc: dict, content: str) -> str:
+    if doc.get("kind") == "web":
+        return f'<Document href="{doc["source"]}"/>\n{content}\n</Document>'
+    return f'<Document source="{doc["source"]}" page="{doc.get("page", "")}"/>\n{content}\n</Document>'
+
+def pack_context(context: Dict[str, dict], query: str, budget: int = CONTEXT_TOKEN_BUDGET,
+                 chunk_tokens: int = CONTEXT_CHUNK_TOKENS) -> str:
+    """ The chunks most relevant to query that fit in budget tokens, formatted per source """
+    chunks = [(source, i, text, Counter(terms(text)))
+              for source, doc in context.items()
+              for i, text in enumerate(chunk_document(doc["content"], chunk_tokens))]
+    query_terms = set(terms(query))
+    # BM25-style weighting: terms that occur in few chunks count for more
+    document_frequency = Counter(term for *_, counts in chunks for term in query_terms & counts.keys())
+
+    def score(chunk) -> float:
+        counts = chunk[3]
+        return sum(math.log(1 + len(chunks) / document_frequency[term]) * counts[term] / (counts[term] + 1.2)
+                   for term in query_terms & counts.keys())
+
+    selected, used = set(), 0
+    for chunk in sorted(chunks, key=score, reverse=True):
+        cost = estimate_tokens(chunk[2])
+        if used + cost <= budget:
+            selected.add(chunk[:2])
+            used += cost
+    packed = []
+    for source, doc in context.items():
+        texts = [text for chunk_source, i, text, _ in chunks if chunk_source == source and (source, i) in selected]
+        if texts:
+            packed.append(format_document(doc, "\n\n[...]\n\n".join(texts)))
+    return "\n\n---\n\n".join(packed)
 
 ### Schema 
 
@@ -47,7 +350,8 @@ class GenerateAnalystsState(TypedDict):
 
 class InterviewState(MessagesState):
     max_num_turns: int # Number turns of conversation
-    context: Annotated[list, operator.add] # Source docs
+    search_query: str # Retrieval query for the latest question, shared by both searches
+    context: Annotated[dict, merge_context] # Source docs by source, see merge_context
     analyst: Analyst # Analyst asking questions
     interview: str # Interview transcript
     sections: list # Final key we duplicate in outer state for Send() API
@@ -154,51 +458,105 @@ Pay particular attention to the final question posed by the analyst.
 
 Convert this final question into a well-structured web search query""")
 
-def search_web(state: InterviewState):
-    
-    """ Retrieve docs from web search """
+def write_search_query(state: InterviewState):
 
-    # Search
-    tavily_search = TavilySearchResults(max_results=3)
+    """ Turn the latest question into one query for both retrieval branches """
 
-    # Search query
     structured_llm = llm.with_structured_output(SearchQuery)
     search_query = structured_llm.invoke([search_instructions]+state['messages'])
+    return {"search_query": search_query.search_query or ""}
+
+# Retrieval: results are cached per normalized query, and each fetch is given
+# SEARCH_TIMEOUT seconds so one slow source does not hold up the answer.
+# SEARCH_MODE=offline swaps both sources for LocalSearch (no network needed).
+SEARCH_MODE = os.environ.get("SEARCH_MODE", "live")
+SEARCH_TIMEOUT = float(os.environ.get("SEARCH_TIMEOUT", "10"))
+SEARCH_CACHE_SIZE = int(os.environ.get("SEARCH_CACHE_SIZE", "256"))
+search_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="search")
+logger = logging.getLogger(__name__)
+
+class LocalSearch:
+
+    """ Offline stand-in for Tavily and Wikipedia.
+
+    Ranks the .txt/.md files of a directory by how many query terms they
+    contain, or returns placeholder documents when no directory is given.
+    latency (seconds) is added to every search to mimic a remote service. """
+
+    def __init__(self, directory: Optional[str] = None, latency: float = 0.0):
+        self.latency = latency
+        self.docs = {}
+        for path in sorted(glob.glob(os.path.join(directory, "**", "*.*"), recursive=True)) if directory else []:
+            if path.endswith((".txt", ".md")):
+                with open(path, encoding="utf-8") as f:
+                    self.docs[path] = f.read()
+
+    def search(self, query: str, k: int) -> List[dict]:
+        time.sleep(self.latency)
+        if not self.docs:
+            return [{"source": f"offline://{'-'.join(sorted(set(terms(query))))[:60]}/{i}",
+                     "content": f"Offline stand-in document {i} for: {query}"} for i in range(k)]
+        query_terms = set(terms(query))
+        ranked = sorted(self.docs.items(), key=lambda doc: -len(query_terms & set(terms(doc[1]))))
+        return [{"source": path, "content": text} for path, text in ranked[:k]]
+
+local_search = LocalSearch(os.environ.get("OFFLINE_DOCS_DIR"),
+                           latency=float(os.environ.get("OFFLINE_SEARCH_LATENCY", "0")))
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+@functools.lru_cache(maxsize=SEARCH_CACHE_SIZE)
+def fetch_web(query: str) -> tuple:
+    """ Tavily results for a normalized query, as (url, content) pairs """
+    if SEARCH_MODE == "offline":
+        return tuple((doc["source"], doc["content"]) for doc in local_search.search(query, 3))
+    docs = TavilySearchResults(max_results=3).invoke(query)
+    if not isinstance(docs, list):
+        # the tool reports errors as a string; raise so the failure is not cached
+        raise RuntimeError(f"Tavily search failed: {docs}")
+    return tuple((doc["url"], doc["content"]) for doc in docs)
+
+@functools.lru_cache(maxsize=SEARCH_CACHE_SIZE)
+def fetch_wikipedia(query: str) -> tuple:
+    """ Wikipedia pages for a normalized query, as (source, page, content) triples """
+    if SEARCH_MODE == "offline":
+        return tuple((doc["source"], "", doc["content"]) for doc in local_search.search(query, 2))
+    docs = WikipediaLoader(query=query, load_max_docs=2).load()
+    return tuple((doc.metadata["source"], doc.metadata.get("page", ""), doc.page_content)
+                 for doc in docs)
+
+def fetch_with_timeout(fetch, query: str) -> tuple:
+    """ Run a fetch on the search pool; no results if it fails or takes longer than SEARCH_TIMEOUT """
+    query = normalize_query(query)
+    if not query:
+        return ()
+    try:
+        return search_pool.submit(fetch, query).result(timeout=SEARCH_TIMEOUT)
+    except Exception as e:
+        # a timed-out fetch keeps running and fills the cache for the next turn
+        logger.warning("%s(%r) gave no results: %r", fetch.__name__, query, e)
+        return ()
+
+def search_web(state: InterviewState):
     
+    """ Retrieve docs from web search """
+
     # Search
-    search_docs = tavily_search.invoke(search_query.search_query)
-
-     # Format
-    formatted_search_docs = "\n\n---\n\n".join(
-        [
-            f'<Document href="{doc["url"]}"/>\n{doc["content"]}\n</Document>'
-            for doc in search_docs
-        ]
-    )
+    search_docs = fetch_with_timeout(fetch_web, state['search_query'])
 
-    return {"context": [formatted_search_docs]} 
+    return {"context": [{"source": url, "content": content, "kind": "web"}
+                        for url, content in search_docs]}
 
 def search_wikipedia(state: InterviewState):
     
     """ Retrieve docs from wikipedia """
 
-    # Search query
-    structured_llm = llm.with_structured_output(SearchQuery)
-    search_query = structured_llm.invoke([search_instructions]+state['messages'])
-    
     # Search
-    search_docs = WikipediaLoader(query=search_query.search_query, 
-                                  load_max_docs=2).load()
-
-     # Format
-    formatted_search_docs = "\n\n---\n\n".join(
-        [
-            f'<Document source="{doc.metadata["source"]}" page="{doc.metadata.get("page", "")}"/>\n{doc.page_content}\n</Document>'
-            for doc in search_docs
-        ]
-    )
+    search_docs = fetch_with_timeout(fetch_wikipedia, state['search_query'])
 
-    return {"context": [formatted_search_docs]} 
+    return {"context": [{"source": source, "page": page, "content": content, "kind": "wikipedia"}
+                        for source, page, content in search_docs]}
 
 # Generate expert answer
 answer_instructions = """You are an expert being interviewed by an analyst.
@@ -236,7 +594,9 @@ def generate_answer(state: InterviewState):
     # Get state
     analyst = state["analyst"]
     messages = state["messages"]
-    context = state["context"]
+    # Context most relevant to the question just asked, within the token budget
+    context = pack_context(state.get("context", {}),
+                           f"{messages[-1].content} {state.get('search_query', '')}")
 
     # Answer question
     system_message = answer_instructions.format(goals=analyst.persona, context=context)
@@ -345,8 +705,8 @@ def write_section(state: InterviewState):
 
     # Get state
     interview = state["interview"]
-    context = state["context"]
     analyst = state["analyst"]
+    context = pack_context(state.get("context", {}), f"{analyst.role} {analyst.description}")
    
     # Write section using either the gathered source docs from interview (context) or the interview itself (interview)
     system_message = section_writer_instructions.format(focus=analyst.description)
@@ -357,23 +717,39 @@ def write_section(state: InterviewState):
 
 # Add nodes and edges 
 interview_builder = StateGraph(InterviewState)
-interview_builder.add_node("ask_question", generate_question)
+interview_builder.add_node("ask_question", generate_question, retry_policy=llm_retry_policy)
+interview_builder.add_node("write_search_query", write_search_query, retry_policy=llm_retry_policy)
 interview_builder.add_node("search_web", search_web)
 interview_builder.add_node("search_wikipedia", search_wikipedia)
-interview_builder.add_node("answer_question", generate_answer)
+interview_builder.add_node("answer_question", generate_answer, retry_policy=llm_retry_policy)
 interview_builder.add_node("save_interview", save_interview)
-interview_builder.add_node("write_section", write_section)
+interview_builder.add_node("write_section", write_section, retry_policy=llm_retry_policy)
 
 # Flow
 interview_builder.add_edge(START, "ask_question")
-interview_builder.add_edge("ask_question", "search_web")
-interview_builder.add_edge("ask_question", "search_wikipedia")
+interview_builder.add_edge("ask_question", "write_search_query")
+interview_builder.add_edge("write_search_query", "search_web")
+interview_builder.add_edge("write_search_query", "search_wikipedia")
 interview_builder.add_edge("search_web", "answer_question")
 interview_builder.add_edge("search_wikipedia", "answer_question")
 interview_builder.add_conditional_edges("answer_question", route_messages,['ask_question','save_interview'])
 interview_builder.add_edge("save_interview", "write_section")
 interview_builder.add_edge("write_section", END)
 
+# At most MAX_CONCURRENT_INTERVIEWS interview subgraphs run at once; the rest
+# of the Send() fan-out waits here instead of piling onto the rate limiter
+MAX_CONCURRENT_INTERVIEWS = int(os.environ.get("MAX_CONCURRENT_INTERVIEWS", "4"))
+interview_gate = threading.BoundedSemaphore(MAX_CONCURRENT_INTERVIEWS)
+interview_graph = interview_builder.compile()
+
+def conduct_interview(state: InterviewState, config: RunnableConfig):
+
+    """ Run one interview subgraph once a slot at the gate is free """
+
+    with interview_gate:
+        interview = interview_graph.invoke(state, config)
+    return {"sections": interview["sections"]}
+
 def initiate_all_interviews(state: ResearchGraphState):
 
     """ Conditional edge to initiate all interviews via Send() API or return to create_analysts """    
@@ -501,35 +877,39 @@ def write_conclusion(state: ResearchGraphState):
     conclusion = llm.invoke([instructions]+[HumanMessage(content=f"Write the report conclusion")]) 
     return {"conclusion": conclusion.content}
 
+REPORT_TITLE = "## Insights"
+SOURCES_HEADER = "\n## Sources\n"
+SECTION_SEPARATOR = "\n\n---\n\n"
+
+def split_report_content(content: str):
+
+    """ Report body without its title, and its sources (None if there is no Sources section) """
+
+    if content.startswith(REPORT_TITLE):
+        content = content[len(REPORT_TITLE):]
+    body, header, sources = content.partition(SOURCES_HEADER)
+    return body, (sources if header else None)
+
 def finalize_report(state: ResearchGraphState):
 
     """ The is the "reduce" step where we gather all the sections, combine them, and reflect on them to write the intro/conclusion """
 
     # Save full final report
-    content = state["content"]
-    if content.startswith("## Insights"):
-        content = content.strip("## Insights")
-    if "## Sources" in content:
-        try:
-            content, sources = content.split("\n## Sources\n")
-        except:
-            sources = None
-    else:
-        sources = None
+    content, sources = split_report_content(state["content"])
 
-    final_report = state["introduction"] + "\n\n---\n\n" + content + "\n\n---\n\n" + state["conclusion"]
+    final_report = state["introduction"] + SECTION_SEPARATOR + content + SECTION_SEPARATOR + state["conclusion"]
     if sources is not None:
         final_report += "\n\n## Sources\n" + sources
     return {"final_report": final_report}
 
 # Add nodes and edges 
 builder = StateGraph(ResearchGraphState)
-builder.add_node("create_analysts", create_analysts)
+builder.add_node("create_analysts", create_analysts, retry_policy=llm_retry_policy)
 builder.add_node("human_feedback", human_feedback)
-builder.add_node("conduct_interview", interview_builder.compile())
-builder.add_node("write_report",write_report)
-builder.add_node("write_introduction",write_introduction)
-builder.add_node("write_conclusion",write_conclusion)
+builder.add_node("conduct_interview", conduct_interview)
+builder.add_node("write_report", write_report, retry_policy=llm_retry_policy)
+builder.add_node("write_introduction", write_introduction, retry_policy=llm_retry_policy)
+builder.add_node("write_conclusion", write_conclusion, retry_policy=llm_retry_policy)
 builder.add_node("finalize_report",finalize_report)
 
 # Logic
@@ -543,4 +923,111 @@ builder.add_edge(["write_conclusion", "write_report", "write_introduction"], "fi
 builder.add_edge("finalize_report", END)
 
 # Compile
-graph = builder.compile(interrupt_before=['human_feedback'])
\ No newline at end of file
+graph = builder.compile(interrupt_before=['human_feedback'])
+
+### Streaming
+
+# Report parts in final_report order: (state key, node writing it)
+REPORT_PARTS = (("introduction", "write_introduction"), ("content", "write_report"),
+                ("conclusion", "write_conclusion"))
+
+class ReportBodyStream:
+
+    """ Incremental split_report_content: feed() returns the body text that is
+    safe to show so far, holding back anything that may turn out to be the
+    title or the start of the Sources section """
+
+    def __init__(self):
+        self.pending = ""
+        self.title_checked = False
+        self.sources = None
+
+    def feed(self, text: str) -> str:
+        if self.sources is not None:
+            self.sources += text
+            return ""
+        self.pending += text
+        if not self.title_checked:
+            if len(self.pending) < len(REPORT_TITLE) and REPORT_TITLE.startswith(self.pending):
+                return ""
+            if self.pending.startswith(REPORT_TITLE):
+                self.pending = self.pending[len(REPORT_TITLE):]
+            self.title_checked = True
+        body, header, sources = self.pending.partition(SOURCES_HEADER)
+        if header:
+            self.pending, self.sources = "", sources
+            return body
+        hold = next((k for k in range(len(SOURCES_HEADER) - 1, 0, -1)
+                     if self.pending.endswith(SOURCES_HEADER[:k])), 0)
+        ready, self.pending = self.pending[:len(self.pending) - hold], self.pending[len(self.pending) - hold:]
+        return ready
+
+def stream_report(input, config: RunnableConfig, report_graph=graph):
+
+    """ Run (or resume) the research graph and yield the final report as it is written.
+
+    Tokens of the report part that comes next in the document (introduction,
+    then body, then conclusion) are yielded as the LLM produces them; a part
+    that finished early is yielded whole as soon as its turn comes.
+
+    A node retried under llm_retry_policy starts its part over: text buffered
+    from the failed attempt is dropped. If some of the failed attempt had
+    already been yielded, the rest of the part is held until its node
+    finishes; when the final text does not continue what was sent, the part
+    is sent again in full after a separator. Apart from that case the
+    yielded text concatenates to exactly the final_report state value. """
+
+    parts = [key for key, _ in REPORT_PARTS]
+    part_of_node = {node: key for key, node in REPORT_PARTS}
+    streamed = {key: "" for key in parts}  # text of the current attempt, per part
+    sent = {key: "" for key in parts}  # text already yielded, per part
+    attempt = {}  # part -> message id of the LLM call being streamed
+    restarted = set()  # parts held back because a failed attempt was already sent
+    finished = {}  # part -> final text
+    body_stream = ReportBodyStream()
+    sources = None
+    current = 0
+
+    for mode, event in report_graph.stream(input, config, stream_mode=["messages", "updates"]):
+        if mode == "messages":
+            chunk, metadata = event
+            key = part_of_node.get(metadata.get("langgraph_node"))
+            if key is None or key in finished or not isinstance(chunk.content, str):
+                continue
+            if chunk.id is not None and attempt.setdefault(key, chunk.id) != chunk.id:
+                # a new LLM call for this part: the node was retried
+                attempt[key] = chunk.id
+                streamed[key] = ""
+                if key == "content":
+                    body_stream = ReportBodyStream()
+                if sent[key]:
+                    restarted.add(key)
+            text = body_stream.feed(chunk.content) if key == "content" else chunk.content
+            streamed[key] += text
+            if current < len(parts) and key == parts[current] and key not in restarted:
+                sent[key] += text
+                yield text
+            continue
+        for node, update in event.items():
+            key = part_of_node.get(node)
+            if key is None or not update:
+                continue
+            if key == "content":
+                finished[key], sources = split_report_content(update[key])
+            else:
+                finished[key] = update[key]
+        # catch up: finish the current part, then move on while parts are complete
+        while current < len(parts) and parts[current] in finished:
+            key = parts[current]
+            full = finished[key]
+            if full.startswith(sent[key]):
+                yield full[len(sent[key]):]
+            else:
+                yield SECTION_SEPARATOR + full
+            current += 1
+            if current < len(parts):
+                key = parts[current]
+                sent[key] = streamed[key]
+                yield SECTION_SEPARATOR + sent[key]
+    if current == len(parts) and sources is not None:
+        yield "\n\n## Sources\n" + sources
@@ -0,0 +1,64 @@
+"""
+Per-item latency of batch tools vs N single calls over the MCP stdio transport.
+Run with: uv run python -m benchmarks.batch_latency [batch_size]
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def server_parameters() -> StdioServerParameters:
+    return StdioServerParameters(
+        command=sys.executable,
+        args=["-c", "import main; main.mcp.run()"],
+        cwd=SERVER_DIR,
+    )
+
+
+async def per_item_ms(session: ClientSession, single: str, batch: str, key: str, ids: list) -> dict:
+    start = time.perf_counter()
+    for item_id in ids:
+        await session.call_tool(single, {key: item_id})
+    singles = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await session.call_tool(batch, {key + "s": ids})
+    batched = time.perf_counter() - start
+    return {
+        "single_ms_per_item": round(1000 * singles / len(ids), 3),
+        "batch_ms_per_item": round(1000 * batched / len(ids), 3),
+        "speedup": round(singles / batched, 1),
+    }
+
+
+async def main(batch_size: int) -> dict:
+    with open(os.devnull, "w") as server_log:
+        async with stdio_client(server_parameters(), errlog=server_log) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                return await compare(session, batch_size)
+
+
+async def compare(session: ClientSession, batch_size: int) -> dict:
+    user_ids = [1 + i % 4 for i in range(batch_size)]
+    product_ids = [101 + i % 4 for i in range(batch_size)]
+    return {
+        "batch_size": batch_size,
+        "users": await per_item_ms(session, "get_user_by_id", "get_users_by_ids",
+                                   "user_id", user_ids),
+        "products": await per_item_ms(session, "get_product_by_id", "get_products_by_ids",
+                                      "product_id", product_ids),
+    }
+
+
+if __name__ == "__main__":
+    batch_size = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    print(json.dumps(asyncio.run(main(batch_size)), indent=2))
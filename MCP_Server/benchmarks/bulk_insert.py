@@ -0,0 +1,45 @@
+"""
+Bulk-insert benchmark: O(1) sequence ids vs the old max() scan per insert.
+Run with: uv run python -m benchmarks.bulk_insert [n_rows ...]
+"""
+
+import json
+import sys
+import time
+
+from main import USER_SCHEMA
+from toydb import Table
+from benchmarks.synthetic import make_users
+
+
+def insert_with_max_scan(n: int) -> float:
+    """Allocate each id the way create_user used to: max() over the table"""
+    table = Table("users", schema=USER_SCHEMA)
+    start = time.perf_counter()
+    for row in make_users(n):
+        row["id"] = max((user["id"] for user in table), default=0) + 1
+        table.insert(row)
+    return time.perf_counter() - start
+
+
+def insert_with_sequence(n: int) -> float:
+    table = Table("users", schema=USER_SCHEMA)
+    start = time.perf_counter()
+    for row in make_users(n):
+        row["id"] = table.next_id()
+        table.insert(row)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1_000, 4_000, 16_000]
+    results = []
+    for n in sizes:
+        max_scan, sequence = insert_with_max_scan(n), insert_with_sequence(n)
+        results.append({
+            "rows": n,
+            "max_scan_s": round(max_scan, 4),
+            "sequence_s": round(sequence, 4),
+            "speedup": round(max_scan / sequence, 1),
+        })
+    print(json.dumps(results, indent=2))
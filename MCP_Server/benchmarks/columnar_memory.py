@@ -0,0 +1,44 @@
+"""
+Compare memory per row of the "rows" and "columns" table backends, and what
+the denormalized order view (JoinView) adds on top of the orders table.
+Run with: uv run python -m benchmarks.columnar_memory [n_rows]
+"""
+
+import json
+import sys
+
+from main import ORDER_SCHEMA, PRODUCT_SCHEMA, USER_SCHEMA
+from toydb import HashIndex, JoinView, Table, np
+from benchmarks.synthetic import make_orders, make_products, make_users
+
+
+def bytes_per_row(n: int) -> dict:
+    generators = {
+        "users": (USER_SCHEMA, lambda: make_users(n)),
+        "products": (PRODUCT_SCHEMA, lambda: make_products(n)),
+        "orders": (ORDER_SCHEMA, lambda: make_orders(n, n, n)),
+    }
+    report = {}
+    for name, (schema, rows) in generators.items():
+        report[name] = {
+            backend: round(Table(name, rows(), schema=schema, backend=backend).memory_usage() / n, 1)
+            for backend in ("rows", "columns")
+        }
+    report["orders_view"] = {backend: round(view_bytes(n, backend) / n, 1)
+                             for backend in ("rows", "columns")}
+    return report
+
+
+def view_bytes(n: int, backend: str) -> int:
+    users = Table("users", make_users(n), schema=USER_SCHEMA, backend=backend)
+    products = Table("products", make_products(n), schema=PRODUCT_SCHEMA, backend=backend)
+    orders = Table("orders", make_orders(n, n, n), schema=ORDER_SCHEMA, backend=backend,
+                   indexes=[HashIndex("user_id"), HashIndex("product_id")])
+    view = JoinView(orders, {"user_name": ("user_id", users, "name"),
+                             "product_name": ("product_id", products, "name")})
+    return view.memory_usage()
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    print(json.dumps({"rows": n, "numpy": np is not None, "bytes_per_row": bytes_per_row(n)}, indent=2))
@@ -0,0 +1,82 @@
+"""
+Point-lookup latency while slow analytics calls run concurrently, over stdio.
+Run with: uv run python -m benchmarks.mixed_latency [users] [concurrent_scans]
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+from benchmarks.batch_latency import SERVER_DIR
+
+SEED_AND_RUN = """
+import main
+from benchmarks.synthetic import make_users
+users = make_users({users}, start_id=100)
+if main.sql_tools:
+    main.sql_db.insert_many("users", users)
+else:
+    main.users_db.bulk_insert(users)
+main.mcp.run()
+"""
+
+
+def percentile(samples: list, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def scan_forever(session: ClientSession, stop: asyncio.Event) -> int:
+    calls = 0
+    while not stop.is_set():
+        # two-letter queries are too short for the trigram index: a full scan
+        await session.call_tool("search_users", {"query": "zq", "limit": 10})
+        calls += 1
+    return calls
+
+
+async def lookups(session: ClientSession, n: int) -> list:
+    latencies = []
+    for i in range(n):
+        start = time.perf_counter()
+        await session.call_tool("get_user_by_id", {"user_id": 1 + i % 4})
+        latencies.append(1000 * (time.perf_counter() - start))
+        await asyncio.sleep(0.005)
+    return latencies
+
+
+async def main(users: int, scans: int) -> dict:
+    params = StdioServerParameters(
+        command=sys.executable,
+        args=["-c", SEED_AND_RUN.format(users=users)],
+        cwd=SERVER_DIR,
+    )
+    # keep the server's request logging out of the results
+    with open(os.devnull, "w") as server_log:
+        async with stdio_client(params, errlog=server_log) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                stop = asyncio.Event()
+                scanners = [asyncio.create_task(scan_forever(session, stop))
+                            for _ in range(scans)]
+                latencies = await lookups(session, 200)
+                stop.set()
+                scan_calls = sum(await asyncio.gather(*scanners))
+    return {
+        "users": users,
+        "concurrent_scans": scans,
+        "scan_calls": scan_calls,
+        "lookup_p50_ms": round(percentile(latencies, 0.50), 2),
+        "lookup_p99_ms": round(percentile(latencies, 0.99), 2),
+    }
+
+
+if __name__ == "__main__":
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    scans = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    print(json.dumps(asyncio.run(main(users, scans)), indent=2))
@@ -0,0 +1,76 @@
+"""
+Stress test for create_order: many parallel orders against a few products.
+Fails (exit code 1) if stock is ever oversold or orders and stock disagree.
+Works with every TOYDB_BACKEND; with sqlite the orders are read back with SQL.
+Run with: uv run python -m benchmarks.order_stress [threads] [orders_per_thread]
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import json
+import random
+import sys
+import time
+
+import main
+
+PRODUCT_IDS = [101, 102, 103, 104]
+INITIAL_STOCK = 500
+
+
+def place_orders(worker: int, count: int) -> int:
+    rng = random.Random(worker)
+    placed = 0
+    for _ in range(count):
+        order = main.create_order(rng.randint(1, 4), rng.choice(PRODUCT_IDS), rng.randint(1, 3))
+        placed += order is not None
+    return placed
+
+
+def next_order_id() -> int:
+    if main.sql_tools:
+        return main.sql_db.query_one("SELECT COALESCE(MAX(id), 0) + 1 AS id FROM orders")["id"]
+    return main.orders_db.sequence.current
+
+
+def units_sold(first_order_id: int) -> dict:
+    """Units ordered per product in orders with id >= first_order_id"""
+    sold = {product_id: 0 for product_id in PRODUCT_IDS}
+    if main.sql_tools:
+        for row in main.sql_db.query("SELECT product_id, SUM(quantity) AS units FROM orders "
+                                     "WHERE id >= ? GROUP BY product_id", (first_order_id,)):
+            sold[row["product_id"]] = row["units"]
+        return sold
+    for order in main.orders_db:
+        if order["id"] >= first_order_id:
+            sold[order["product_id"]] += order["quantity"]
+    return sold
+
+
+def run(threads: int, orders_per_thread: int) -> dict:
+    for product_id in PRODUCT_IDS:
+        main.update_product_stock(product_id, INITIAL_STOCK)
+    first_order_id = next_order_id()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        placed = sum(pool.map(place_orders, range(threads), [orders_per_thread] * threads))
+    elapsed = time.perf_counter() - start
+
+    sold = units_sold(first_order_id)
+    problems = []
+    for product_id in PRODUCT_IDS:
+        stock = main.get_product_by_id(product_id)["stock"]
+        if stock < 0:
+            problems.append(f"product {product_id} oversold: stock {stock}")
+        if stock + sold[product_id] != INITIAL_STOCK:
+            problems.append(f"product {product_id}: stock {stock} + sold {sold[product_id]} != {INITIAL_STOCK}")
+    return {"threads": threads, "attempts": threads * orders_per_thread, "placed": placed,
+            "orders_per_s": round(threads * orders_per_thread / elapsed), "problems": problems}
+
+
+if __name__ == "__main__":
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    orders_per_thread = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    result = run(threads, orders_per_thread)
+    print(json.dumps(result, indent=2))
+    sys.exit(1 if result["problems"] else 0)
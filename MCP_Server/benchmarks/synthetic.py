@@ -0,0 +1,50 @@
+"""
+Deterministic synthetic rows for the toy database benchmarks.
+"""
+
+from datetime import date, timedelta
+from typing import Dict, Iterator
+import random
+
+CITIES = ["New York", "San Francisco", "Chicago", "Boston", "Seattle", "Austin", "Denver", "Miami"]
+CATEGORIES = ["Electronics", "Kitchen", "Office", "Garden", "Toys", "Books", "Sports"]
+FIRST_NAMES = ["Alice", "Bob", "Charlie", "Diana", "Ethan", "Fiona", "George", "Hannah"]
+
+
+def make_users(n: int, start_id: int = 1, seed: int = 0) -> Iterator[Dict]:
+    rng = random.Random(seed)
+    for user_id in range(start_id, start_id + n):
+        name = f"{rng.choice(FIRST_NAMES)} {user_id}"
+        yield {
+            "id": user_id,
+            "name": name,
+            "email": f"user{user_id}@example.com",
+            "age": rng.randint(18, 80),
+            "city": rng.choice(CITIES),
+        }
+
+
+def make_products(n: int, start_id: int = 101, seed: int = 1) -> Iterator[Dict]:
+    rng = random.Random(seed)
+    for product_id in range(start_id, start_id + n):
+        yield {
+            "id": product_id,
+            "name": f"Product {product_id}",
+            "price": round(rng.uniform(1, 1000), 2),
+            "category": rng.choice(CATEGORIES),
+            "stock": rng.randint(0, 500),
+        }
+
+
+def make_orders(n: int, n_users: int, n_products: int, start_id: int = 1001,
+                seed: int = 2) -> Iterator[Dict]:
+    rng = random.Random(seed)
+    first_day = date(2024, 1, 1)
+    for order_id in range(start_id, start_id + n):
+        yield {
+            "id": order_id,
+            "user_id": rng.randint(1, n_users),
+            "product_id": rng.randint(101, 100 + n_products),
+            "quantity": rng.randint(1, 5),
+            "date": (first_day + timedelta(days=rng.randint(0, 365))).isoformat(),
+        }
@@ -0,0 +1,279 @@
+"""
+Benchmark suite for every MCP tool, in-process and over the stdio transport.
+
+Seeds users_db/products_db/orders_db with synthetic rows, calls each tool
+(and reads each resource template) with generated arguments, and reports
+throughput and p50/p95/p99 latency as JSON. Pass --baseline with an earlier
+report to list tools whose p50 got slower.
+
+Run with: uv run python -m benchmarks.tool_suite --rows 1000 100000 --out bench.json
+(use TOYDB_BACKEND=columns for 10^6 rows and up, or TOYDB_BACKEND=sqlite)
+"""
+
+from typing import Callable, Dict, List
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic import CATEGORIES, CITIES, make_orders, make_products, make_users
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REGRESSION_FACTOR = 1.25
+
+# The seed data in main.py uses users 1-4 and products 101-104
+FIRST_USER, FIRST_PRODUCT = 5, 105
+
+
+def table_sizes(rows: int) -> Dict[str, int]:
+    return {"users": rows, "products": max(10, rows // 10), "orders": rows}
+
+
+def seed(rows: int) -> None:
+    """Fill main's tables with synthetic rows (orders reference real users/products)"""
+    import main
+    sizes = table_sizes(rows)
+    users = make_users(sizes["users"], start_id=FIRST_USER)
+    products = make_products(sizes["products"], start_id=FIRST_PRODUCT)
+    orders = make_orders(sizes["orders"], sizes["users"], sizes["products"],
+                         start_id=main.orders_db.sequence.current)
+    if main.sql_tools:
+        for name, table_rows in (("users", users), ("products", products), ("orders", orders)):
+            main.sql_db.insert_many(name, table_rows)
+        return
+    # one bulk load per table: indexes are built in one pass, not one insort per row
+    for table, table_rows in ((main.users_db, users), (main.products_db, products),
+                              (main.orders_db, orders)):
+        table.bulk_insert(table_rows)
+
+
+def workloads(rows: int) -> Dict[str, Callable[[random.Random], Dict]]:
+    """Argument generator per tool"""
+    sizes = table_sizes(rows)
+
+    def user_id(rng):
+        return rng.randint(1, sizes["users"])
+
+    def product_id(rng):
+        return rng.randint(101, 100 + sizes["products"])
+
+    def date(rng):
+        return f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+
+    return {
+        "get_user_by_id": lambda rng: {"user_id": user_id(rng)},
+        "get_users_by_ids": lambda rng: {"user_ids": [user_id(rng) for _ in range(50)]},
+        "get_users_by_city": lambda rng: {"city": rng.choice(CITIES), "limit": 100},
+        "create_user": lambda rng: {"name": "Bench User", "email": "bench@example.com",
+                                    "age": rng.randint(18, 80), "city": rng.choice(CITIES)},
+        "get_product_by_id": lambda rng: {"product_id": product_id(rng)},
+        "get_products_by_ids": lambda rng: {"product_ids": [product_id(rng) for _ in range(50)]},
+        "get_products_by_category": lambda rng: {"category": rng.choice(CATEGORIES), "limit": 100},
+        "update_product_stock": lambda rng: {"product_id": product_id(rng),
+                                             "new_stock": rng.randint(0, 500)},
+        "update_products_stock": lambda rng: {"updates": [
+            {"product_id": product_id(rng), "new_stock": rng.randint(0, 500)} for _ in range(10)]},
+        "get_user_orders": lambda rng: {"user_id": user_id(rng)},
+        "create_order": lambda rng: {"user_id": user_id(rng), "product_id": product_id(rng),
+                                     "quantity": 1},
+        "create_orders": lambda rng: {"orders": [
+            {"user_id": user_id(rng), "product_id": product_id(rng), "quantity": 1}
+            for _ in range(10)]},
+        "get_sales_by_category": lambda rng: {},
+        "get_user_statistics": lambda rng: {},
+        "get_resource_if_changed": lambda rng: {"uri": f"user://{user_id(rng)}"},
+        "search_users": lambda rng: {"query": f"user{user_id(rng)}@", "limit": 20},
+        "get_low_stock_products": lambda rng: {"threshold": 10, "limit": 100},
+        "get_products_by_price_range": lambda rng: {"min_price": 100.0, "max_price": 110.0,
+                                                    "limit": 100},
+        "get_users_by_age_range": lambda rng: {"min_age": 30, "max_age": 31, "limit": 100},
+        "get_orders_by_date_range": lambda rng: {"start_date": date(rng), "end_date": date(rng),
+                                                 "limit": 100},
+        "get_top_products": lambda rng: {"by": rng.choice(["price", "stock"]), "k": 10},
+        "get_best_selling_products": lambda rng: {"k": 10},
+        "get_sales_trends": lambda rng: {"period": rng.choice(["day", "week", "month"]),
+                                         "by": "category", "start_date": date(rng)},
+        "get_changes": lambda rng: {"after_seq": 0, "limit": 100},
+        "get_server_metrics": lambda rng: {},
+    }
+
+
+def resource_workloads(rows: int) -> Dict[str, Callable[[random.Random], str]]:
+    users = table_sizes(rows)["users"]
+    return {
+        "user://{user_id}": lambda rng: f"user://{rng.randint(1, users)}",
+        "catalog://{category}": lambda rng: f"catalog://{rng.choice(CATEGORIES).lower()}",
+    }
+
+
+def summarize(latencies: List[float], errors: int) -> Dict:
+    ordered = sorted(latencies)
+
+    def pct(q: float) -> float:
+        return round(1000 * ordered[min(len(ordered) - 1, int(q * len(ordered)))], 3)
+
+    return {
+        "calls": len(ordered),
+        "errors": errors,
+        "throughput_per_s": round(len(ordered) / sum(ordered), 1) if sum(ordered) else None,
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+    }
+
+
+def run_in_process(rows: int, calls: int) -> Dict:
+    import main
+    seed(rows)
+    registered = {tool.name for tool in main.mcp._tool_manager.list_tools()}
+    tools = workloads(rows)
+    missing = sorted(registered - set(tools))
+    results = {}
+    for name, make_args in tools.items():
+        fn = getattr(main, name)
+        rng = random.Random(name)
+        latencies, errors = [], 0
+        for _ in range(calls):
+            args = make_args(rng)
+            start = time.perf_counter()
+            try:
+                fn(**args)
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+        results[name] = summarize(latencies, errors)
+    readers = {"user://{user_id}": lambda uri: main.get_user_resource(uri[len("user://"):]),
+               "catalog://{category}": lambda uri: main.get_catalog_resource(uri[len("catalog://"):])}
+    for template, make_uri in resource_workloads(rows).items():
+        rng = random.Random(template)
+        latencies = []
+        for _ in range(calls):
+            uri = make_uri(rng)
+            start = time.perf_counter()
+            readers[template](uri)
+            latencies.append(time.perf_counter() - start)
+        results[template] = summarize(latencies, 0)
+    return {"tools": results, "tools_without_workload": missing}
+
+
+async def run_over_stdio(rows: int, calls: int) -> Dict:
+    from mcp import ClientSession, StdioServerParameters
+    from mcp.client.stdio import stdio_client
+
+    params = StdioServerParameters(
+        command=sys.executable,
+        args=["-c", f"from benchmarks.tool_suite import seed; seed({rows}); "
+                    "import main; main.mcp.run()"],
+        cwd=SERVER_DIR,
+        env=server_env(),
+    )
+    results = {}
+    with open(os.devnull, "w") as server_log:
+        async with stdio_client(params, errlog=server_log) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                registered = {tool.name for tool in (await session.list_tools()).tools}
+                tools = workloads(rows)
+                for name, make_args in tools.items():
+                    rng = random.Random(name)
+                    latencies, errors = [], 0
+                    for _ in range(calls):
+                        args = make_args(rng)
+                        start = time.perf_counter()
+                        result = await session.call_tool(name, args)
+                        latencies.append(time.perf_counter() - start)
+                        errors += bool(result.isError)
+                    results[name] = summarize(latencies, errors)
+                for template, make_uri in resource_workloads(rows).items():
+                    rng = random.Random(template)
+                    latencies = []
+                    for _ in range(calls):
+                        uri = make_uri(rng)
+                        start = time.perf_counter()
+                        await session.read_resource(uri)
+                        latencies.append(time.perf_counter() - start)
+                    results[template] = summarize(latencies, 0)
+    return {"tools": results, "tools_without_workload": sorted(registered - set(tools))}
+
+
+def server_env() -> Dict[str, str]:
+    """Environment for a benchmark server: the caller's TOYDB_* settings, and a
+    fresh database file when the sqlite backend is selected"""
+    env = dict(os.environ)
+    if env.get("TOYDB_BACKEND") == "sqlite":
+        env["TOYDB_SQLITE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="toydb-bench-"),
+                                                "toydb.sqlite")
+    return env
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SERVER_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def regressions(report: Dict, baseline: Dict) -> List[Dict]:
+    """Tools whose p50 grew by more than REGRESSION_FACTOR against a baseline report"""
+    slower = []
+    old_runs = {(run["rows"], run["transport"]): run for run in baseline.get("runs", [])}
+    for run in report["runs"]:
+        old = old_runs.get((run["rows"], run["transport"]))
+        if old is None:
+            continue
+        for name, stats in run["tools"].items():
+            before = old["tools"].get(name)
+            if before and before["p50_ms"] and stats["p50_ms"] > REGRESSION_FACTOR * before["p50_ms"]:
+                slower.append({"rows": run["rows"], "transport": run["transport"], "tool": name,
+                               "p50_ms_before": before["p50_ms"], "p50_ms_after": stats["p50_ms"]})
+    return slower
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000],
+                        help="users/orders per run (products are a tenth of that)")
+    parser.add_argument("--calls", type=int, default=200, help="calls per tool")
+    parser.add_argument("--transport", choices=["inprocess", "stdio", "both"], default="both")
+    parser.add_argument("--out", help="also write the report to this file")
+    parser.add_argument("--baseline", help="earlier report to compare p50 latencies against")
+    args = parser.parse_args()
+
+    runs = []
+    for rows in args.rows:
+        if args.transport in ("inprocess", "both"):
+            # each in-process run needs fresh tables, so it gets its own interpreter
+            output = subprocess.run(
+                [sys.executable, "-c", "import json, benchmarks.tool_suite as suite; "
+                 f"print(json.dumps(suite.run_in_process({rows}, {args.calls})))"],
+                cwd=SERVER_DIR, env=server_env(), capture_output=True, text=True, check=True,
+            ).stdout
+            runs.append({"rows": rows, "transport": "inprocess", **json.loads(output)})
+        if args.transport in ("stdio", "both"):
+            runs.append({"rows": rows, "transport": "stdio",
+                         **asyncio.run(run_over_stdio(rows, args.calls))})
+
+    report = {
+        "commit": git_commit(),
+        "backend": os.environ.get("TOYDB_BACKEND", "rows"),
+        "calls_per_tool": args.calls,
+        "runs": runs,
+    }
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["regressions"] = regressions(report, json.load(f))
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Stress test for the denormalized order view: writers insert orders while
+readers page through get_user_orders at the server's switch interval.
+Fails (exit code 1) if a reader errors or sees an order without its joined
+names, or if the view and the orders table disagree afterwards.
+Run with: uv run python -m benchmarks.view_stress [seconds] [writers] [readers]
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import json
+import sys
+import threading
+import time
+
+import main
+from toydb import encode_cursor
+
+USER_ID, PRODUCT_ID = 1, 102
+
+
+def write(stop: threading.Event) -> int:
+    written = 0
+    while not stop.is_set():
+        # quantity 0 never runs out of stock, so every call inserts an order
+        written += main.create_order(USER_ID, PRODUCT_ID, 0) is not None
+    return written
+
+
+def read(stop: threading.Event) -> dict:
+    reads, errors = 0, []
+    while not stop.is_set():
+        try:
+            # read the newest orders, where a writer may still be mid-insert
+            tail = encode_cursor(len(main.orders_db) - 10)
+            for order in main.get_user_orders(USER_ID, limit=50, cursor=tail)["items"]:
+                if order["user_name"] == main.orders_view.missing:
+                    errors.append(f"order {order['id']} has no user_name")
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+        reads += 1
+    return {"reads": reads, "errors": errors}
+
+
+def run(seconds: float, writers: int, readers: int) -> dict:
+    sys.setswitchinterval(main.SWITCH_INTERVAL)
+    stop = threading.Event()
+    with ThreadPoolExecutor(writers + readers) as pool:
+        written = [pool.submit(write, stop) for _ in range(writers)]
+        read_results = [pool.submit(read, stop) for _ in range(readers)]
+        time.sleep(seconds)
+        stop.set()
+        written = sum(future.result() for future in written)
+        read_results = [future.result() for future in read_results]
+    problems = [error for result in read_results for error in result["errors"]]
+    for pos in range(len(main.orders_db)):
+        order = main.orders_view.row_at(pos)
+        if {k: order[k] for k in main.ORDER_SCHEMA} != main.orders_db.row_at(pos):
+            problems.append(f"view row {pos} differs from the orders table")
+    return {"orders_written": written, "reads": sum(result["reads"] for result in read_results),
+            "errors": len(problems), "problems": sorted(set(problems))[:10]}
+
+
+if __name__ == "__main__":
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    writers = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    readers = int(sys.argv[3]) if len(sys.argv) > 3 else 2
+    result = run(seconds, writers, readers)
+    print(json.dumps(result, indent=2))
+    sys.exit(1 if result["problems"] else 0)
@@ -0,0 +1,44 @@
+"""
+Write throughput of the write-ahead log: group commit vs fsync on every write.
+Run with: uv run python -m benchmarks.wal_throughput [writes_per_thread] [threads]
+"""
+
+import json
+import sys
+import tempfile
+import threading
+import time
+
+from main import USER_SCHEMA
+from persistence import WriteAheadLog
+from toydb import Table
+from benchmarks.synthetic import make_users
+
+
+def run(sync: str, writes_per_thread: int, threads: int) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        table = Table("users", schema=USER_SCHEMA)
+        table.journal = WriteAheadLog(directory, sync=sync)
+
+        def writer(worker: int) -> None:
+            start_id = 1 + worker * writes_per_thread
+            for row in make_users(writes_per_thread, start_id=start_id, seed=worker):
+                table.insert(row)
+
+        workers = [threading.Thread(target=writer, args=(i,)) for i in range(threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+        table.journal.close()
+    writes = writes_per_thread * threads
+    return {"sync": sync, "threads": threads, "writes": writes,
+            "seconds": round(elapsed, 3), "writes_per_s": round(writes / elapsed)}
+
+
+if __name__ == "__main__":
+    writes_per_thread = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    print(json.dumps([run(sync, writes_per_thread, threads) for sync in ("always", "group")], indent=2))
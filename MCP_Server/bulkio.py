@@ -0,0 +1,192 @@
+"""
+Streaming bulk import/export of toy database tables in JSONL, CSV and Parquet.
+
+Rows are read and written one batch at a time, so files much larger than
+memory can be moved in and out (the table itself still has to fit). Every
+imported row is checked against the table schema and coerced to its types
+(CSV gives strings); the table builds its indexes and aggregates in one
+pass after the rows are in (Table.bulk_insert). JSONL and CSV files may be
+gzip-compressed (".gz"). Parquet needs pyarrow.
+
+Command line (imports persist only with TOYDB_DATA_DIR or TOYDB_BACKEND=sqlite):
+    uv run python bulkio.py import users users.csv
+    uv run python bulkio.py export orders orders.parquet
+"""
+
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, Optional
+import csv
+import gzip
+import io
+import json
+import os
+import sys
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional; only Parquet needs it
+    pa = pq = None
+
+FORMATS = {".jsonl": "jsonl", ".ndjson": "jsonl", ".csv": "csv", ".parquet": "parquet"}
+BATCH_SIZE = 10000
+
+
+def detect_format(path: str) -> str:
+    base = path[:-3] if path.endswith(".gz") else path
+    fmt = FORMATS.get(os.path.splitext(base)[1].lower())
+    if fmt is None:
+        raise ValueError(f"Cannot tell the format of {path!r}; use one of {sorted(FORMATS)}")
+    return fmt
+
+
+def _open_text(path: str, mode: str) -> io.TextIOBase:
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8", newline="")
+    return open(path, mode, encoding="utf-8", newline="")
+
+
+def _require_pyarrow() -> None:
+    if pq is None:
+        raise RuntimeError("Parquet import/export needs pyarrow (pip install pyarrow)")
+
+
+def read_rows(path: str, fmt: Optional[str] = None) -> Iterator[Dict]:
+    """Stream the raw rows of a file"""
+    fmt = fmt or detect_format(path)
+    if fmt == "jsonl":
+        with _open_text(path, "r") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    elif fmt == "csv":
+        with _open_text(path, "r") as f:
+            yield from csv.DictReader(f)
+    elif fmt == "parquet":
+        _require_pyarrow()
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=BATCH_SIZE):
+            yield from batch.to_pylist()
+    else:
+        raise ValueError(f"Unknown format {fmt!r}")
+
+
+def _coerce(value: Any, kind: type) -> Any:
+    if issubclass(kind, str):
+        if not isinstance(value, str):
+            raise TypeError
+        return str(value)
+    if isinstance(value, bool) or value is None or value == "":
+        raise TypeError
+    if kind is int and isinstance(value, float):
+        if not value.is_integer():
+            raise TypeError
+        return int(value)
+    return kind(value)
+
+
+def _kind_name(kind: type) -> str:
+    return "text" if issubclass(kind, str) else kind.__name__
+
+
+def validate(rows: Iterable[Dict], schema: Dict[str, type], source: str = "input") -> Iterator[Dict]:
+    """Check each row has exactly the schema's fields and coerce them to its types.
+
+    Errors name the row, the schema fields and the expected types but never
+    echo the file's contents, since they go back to MCP clients."""
+    fields = set(schema)
+    for number, row in enumerate(rows, 1):
+        if set(row) != fields:
+            missing, unknown = fields - set(row), set(row) - fields
+            raise ValueError(f"{source} row {number}: missing fields {sorted(missing)}, "
+                             f"{len(unknown)} unknown field(s)")
+        coerced = {}
+        for field, kind in schema.items():
+            try:
+                coerced[field] = _coerce(row[field], kind)
+            except (TypeError, ValueError):
+                raise ValueError(f"{source} row {number}: field {field!r} is not "
+                                 f"{_kind_name(kind)}") from None
+        yield coerced
+
+
+def import_rows(path: str, schema: Dict[str, type], fmt: Optional[str] = None) -> Iterator[Dict]:
+    """Stream validated rows from a file"""
+    return validate(read_rows(path, fmt), schema, source=path)
+
+
+def import_table(table, path: str, fmt: Optional[str] = None) -> int:
+    """Bulk-load a file into a Table; returns the number of rows loaded"""
+    return table.bulk_insert(import_rows(path, table.schema, fmt))
+
+
+def _arrow_schema(schema: Dict[str, type]):
+    types = {int: pa.int64(), float: pa.float64()}
+    return pa.schema([(field, next((t for base, t in types.items() if issubclass(kind, base)),
+                                   pa.string()))
+                      for field, kind in schema.items()])
+
+
+def export_rows(rows: Iterable[Dict], schema: Dict[str, type], path: str,
+                fmt: Optional[str] = None) -> int:
+    """Stream rows to a file with the schema's columns; returns the number written"""
+    fmt = fmt or detect_format(path)
+    fields = list(schema)
+    count = 0
+    rows = iter(rows)
+    if fmt == "jsonl":
+        with _open_text(path, "w") as f:
+            for row in rows:
+                f.write(json.dumps({field: row[field] for field in fields}) + "\n")
+                count += 1
+    elif fmt == "csv":
+        with _open_text(path, "w") as f:
+            writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+            writer.writeheader()
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+    elif fmt == "parquet":
+        _require_pyarrow()
+        arrow_schema = _arrow_schema(schema)
+        with pq.ParquetWriter(path, arrow_schema) as writer:
+            while True:
+                batch = list(islice(rows, BATCH_SIZE))
+                if not batch:
+                    break
+                writer.write_table(pa.Table.from_pylist(batch, schema=arrow_schema))
+                count += len(batch)
+    else:
+        raise ValueError(f"Unknown format {fmt!r}")
+    return count
+
+
+def find_table_file(directory: str, table: str) -> Optional[str]:
+    """The first <table>.<ext> file of a supported format in directory, if any"""
+    for ext in FORMATS:
+        for suffix in (ext, ext + ".gz"):
+            path = os.path.join(directory, table + suffix)
+            if os.path.exists(path) and not (suffix.endswith(".gz") and ext == ".parquet"):
+                return path
+    return None
+
+
+def main(argv: list) -> None:
+    if len(argv) not in (3, 4) or argv[0] not in ("import", "export"):
+        sys.exit("usage: bulkio.py import|export <table> <path> [jsonl|csv|parquet]")
+    command, table, path = argv[:3]
+    fmt = argv[3] if len(argv) == 4 else None
+    import main as server
+    if command == "import":
+        count = server.import_file(table, path, fmt)
+        if server.storage:
+            server.storage.snapshot()
+        elif not server.sql_tools:
+            print("note: no TOYDB_DATA_DIR or sqlite backend, so the import is not kept",
+                  file=sys.stderr)
+    else:
+        count = server.export_file(table, path, fmt)
+    print(json.dumps({"command": command, "table": table, "path": path, "rows": count}))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
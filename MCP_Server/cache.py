@@ -0,0 +1,63 @@
+"""
+Cache of serialized MCP resources, keyed by URI.
+
+Each entry keeps the rendered text and an ETag (a hash of the text), so
+repeated reads and "has it changed?" checks skip both the lookup and
+json.dumps. Writers invalidate the URIs they touch; a render that races
+with an invalidation is not stored, so the cache never serves stale text.
+"""
+
+from collections import OrderedDict
+from typing import Callable, Tuple
+import hashlib
+import threading
+
+
+def make_etag(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+class ResourceCache:
+    """LRU map of URI -> (text, etag) with explicit invalidation"""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, object]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, uri: str, render: Callable[[], str]) -> Tuple[str, str]:
+        """Return (text, etag) for a URI, rendering and caching it on a miss"""
+        with self._lock:
+            entry = self._entries.get(uri)
+            if isinstance(entry, tuple):
+                self._entries.move_to_end(uri)
+                self.hits += 1
+                return entry
+            self.misses += 1
+            # a fresh token marks this render; invalidate() drops it
+            token = object()
+            self._entries[uri] = token
+        text = render()
+        entry = (text, make_etag(text))
+        with self._lock:
+            if self._entries.get(uri) is token:
+                self._entries[uri] = entry
+                self._entries.move_to_end(uri)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, uri: str) -> None:
+        with self._lock:
+            self._entries.pop(uri, None)
+
+    def invalidate_prefix(self, prefix: str) -> None:
+        with self._lock:
+            for uri in [uri for uri in self._entries if uri.startswith(prefix)]:
+                del self._entries[uri]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
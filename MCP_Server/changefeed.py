@@ -0,0 +1,91 @@
+"""
+Append-only change feed of database mutations.
+
+Every insert/update reported by a table listener gets the next sequence
+number; readers ask for the changes after the last number they have seen.
+A bulk load is one entry with op "bulk_insert", id null and fields
+{"count": rows loaded}: readers that see it resync that table from the
+tools, and a large import cannot push every other change out of the feed.
+The feed keeps the most recent `max_changes` entries in memory and starts
+over (with a new epoch) when the server restarts, so a reader whose epoch
+differs, or who gets truncated=true back, has to resync from the tools.
+"""
+
+from collections import deque
+from itertools import islice
+from typing import Callable, Dict, Iterable, List, Optional
+import threading
+import time
+import uuid
+
+
+class ChangeFeed:
+    """Bounded, sequence-numbered log of row changes with blocking reads"""
+
+    def __init__(self, max_changes: int = 100000):
+        self.epoch = uuid.uuid4().hex[:12]
+        self._changes: deque = deque(maxlen=max_changes)
+        self._last_seq = 0
+        self._cond = threading.Condition()
+        self._watchers: List[Callable[[int], None]] = []
+
+    @property
+    def last_seq(self) -> int:
+        return self._last_seq
+
+    def append(self, table: str, op: str, row_id: Optional[int], fields: Dict) -> int:
+        with self._cond:
+            self._last_seq += 1
+            self._changes.append({
+                "seq": self._last_seq,
+                "table": table,
+                "op": op,
+                "id": row_id,
+                "fields": dict(fields),
+                "ts": time.time(),
+            })
+            self._cond.notify_all()
+            seq = self._last_seq
+        for watcher in self._watchers:
+            watcher(seq)
+        return seq
+
+    def listener(self, table: str) -> Callable[[str, int, Dict, Dict], None]:
+        """Table listener (see Table.subscribe) that appends that table's changes"""
+        def on_change(op: str, pos: Optional[int], row: Optional[Dict], fields: Dict) -> None:
+            self.append(table, op, row["id"] if row else None, fields)
+        return on_change
+
+    def watch(self, watcher: Callable[[int], None]) -> None:
+        """Call watcher(seq) after each append (outside the feed lock)"""
+        self._watchers.append(watcher)
+
+    def read(self, after: int = 0, limit: int = 100, tables: Optional[Iterable[str]] = None,
+             wait: float = 0) -> Dict:
+        """Changes with seq > after, oldest first, at most limit.
+
+        With wait > 0, blocks up to that many seconds for a change to arrive.
+        next_seq is the seq to pass as `after` next time; truncated means
+        changes between after and the oldest retained entry were dropped.
+        """
+        tables = set(tables) if tables else None
+        with self._cond:
+            if wait > 0:
+                self._cond.wait_for(lambda: self._last_seq > after, timeout=wait)
+            first_seq = self._last_seq - len(self._changes) + 1
+            start = max(after + 1, first_seq)
+            changes = []
+            next_seq = max(after, first_seq - 1)
+            for change in islice(self._changes, start - first_seq, None):
+                if len(changes) == limit:
+                    break
+                next_seq = change["seq"]
+                if tables is None or change["table"] in tables:
+                    changes.append(change)
+            return {
+                "epoch": self.epoch,
+                "changes": changes,
+                "next_seq": next_seq,
+                "last_seq": self._last_seq,
+                "truncated": after + 1 < first_seq,
+            }
@@ -4,52 +4,262 @@ Run with: uv run mcp install main.py
 """
 
 from mcp.server.fastmcp import FastMCP
-from typing import List, Dict, Optional
+from pydantic import AnyUrl
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Iterable, Iterator, List, Dict, Optional, Union
 from datetime import datetime
+import asyncio
+import atexit
+import functools
+import inspect
 import json
+import os
+import sys
+
+import bulkio
+from cache import ResourceCache
+from changefeed import ChangeFeed
+from metrics import Metrics
+from persistence import Storage
+from toydb import (PERIODS, Category, FieldSum, GroupCount, GroupSum, HashIndex, JoinView,
+                   RankedSum, SortedIndex, Table, TimeRollup, TrigramIndex, check_batch,
+                   decode_cursor, decode_key_cursor, encode_cursor, page, transaction)
+
+# Scans hold the GIL; a shorter switch interval hands it back to the event
+# loop sooner (p99 of lookups next to two full scans: ~136 ms -> ~54 ms).
+# It is process-wide, so it is only set once the server starts, not when the
+# CLI or a benchmark imports this module.
+SWITCH_INTERVAL = float(os.environ.get("TOYDB_SWITCH_INTERVAL", "0.001"))
+
+@asynccontextmanager
+async def _server_lifespan(server: FastMCP) -> AsyncIterator[None]:
+    sys.setswitchinterval(SWITCH_INTERVAL)
+    yield
 
 # Create an MCP server
-mcp = FastMCP("ToyDatabaseServer")
+mcp = FastMCP("ToyDatabaseServer", lifespan=_server_lifespan)
+
+# Storage backend: "rows" (one dict per row), "columns" (typed arrays) or
+# "sqlite" (tools run as SQL against TOYDB_SQLITE_PATH, see sqlite_backend.py)
+TOYDB_BACKEND = os.environ.get("TOYDB_BACKEND", "rows")
+# the in-memory tables still hold the seed rows that a new SQLite file starts with
+MEMORY_BACKEND = "rows" if TOYDB_BACKEND == "sqlite" else TOYDB_BACKEND
+
+USER_SCHEMA = {"id": int, "name": str, "email": str, "age": int, "city": Category}
+PRODUCT_SCHEMA = {"id": int, "name": str, "price": float, "category": Category, "stock": int}
+ORDER_SCHEMA = {"id": int, "user_id": int, "product_id": int, "quantity": int, "date": Category}
 
-# Toy database - in-memory data structures
-users_db = [
+# Optional durable storage: SQLite snapshots plus a write-ahead log in TOYDB_DATA_DIR
+storage = Storage(
+    os.environ["TOYDB_DATA_DIR"],
+    sync=os.environ.get("TOYDB_WAL_SYNC", "group"),
+    snapshot_interval=float(os.environ.get("TOYDB_SNAPSHOT_INTERVAL", "300")),
+) if os.environ.get("TOYDB_DATA_DIR") else None
+
+# Optional directory of <table>.jsonl/.csv/.parquet files to start from instead of the seed data
+SEED_DIR = os.environ.get("TOYDB_SEED_DIR")
+
+def _initial_rows(table: str, schema: Dict[str, type], seed: List[Dict]) -> Iterable[Dict]:
+    """Rows from the latest snapshot if persistence is enabled, else from the
+    table's file in TOYDB_SEED_DIR (streamed and validated), else the seed data"""
+    path = bulkio.find_table_file(SEED_DIR, table) if SEED_DIR else None
+    if path:
+        seed = bulkio.import_rows(path, schema)
+    return storage.snapshot_rows(table, seed) if storage else seed
+
+# Toy database - in-memory tables indexed by primary key
+users_db = Table("users", _initial_rows("users", USER_SCHEMA, [
     {"id": 1, "name": "Alice", "email": "alice@example.com", "age": 28, "city": "New York"},
     {"id": 2, "name": "Bob", "email": "bob@example.com", "age": 32, "city": "San Francisco"},
     {"id": 3, "name": "Charlie", "email": "charlie@example.com", "age": 25, "city": "Chicago"},
     {"id": 4, "name": "Diana", "email": "diana@example.com", "age": 29, "city": "New York"},
-]
+]), indexes=[HashIndex("city", str.lower), TrigramIndex("name", "email", "city"),
+            SortedIndex("age")],
+   schema=USER_SCHEMA, backend=MEMORY_BACKEND,
+   aggregates={"age": FieldSum("age"), "users_by_city": GroupCount("city")})
 
-products_db = [
+products_db = Table("products", _initial_rows("products", PRODUCT_SCHEMA, [
     {"id": 101, "name": "Laptop", "price": 999.99, "category": "Electronics", "stock": 15},
     {"id": 102, "name": "Coffee Mug", "price": 12.50, "category": "Kitchen", "stock": 100},
     {"id": 103, "name": "Headphones", "price": 79.99, "category": "Electronics", "stock": 25},
     {"id": 104, "name": "Notebook", "price": 8.99, "category": "Office", "stock": 50},
-]
+]), indexes=[HashIndex("category", str.lower), SortedIndex("price"), SortedIndex("stock")],
+   schema=PRODUCT_SCHEMA, backend=MEMORY_BACKEND, first_id=101)
+
+def _order_category(order: Dict) -> Optional[str]:
+    product = products_db.get(order["product_id"])
+    return product["category"] if product else None
+
+def _order_amount(order: Dict) -> float:
+    product = products_db.get(order["product_id"])
+    return product["price"] * order["quantity"] if product else 0
 
-orders_db = [
+def _order_product(order: Dict) -> Optional[int]:
+    return order["product_id"] if order["product_id"] in products_db else None
+
+orders_db = Table("orders", _initial_rows("orders", ORDER_SCHEMA, [
     {"id": 1001, "user_id": 1, "product_id": 101, "quantity": 1, "date": "2024-01-15"},
     {"id": 1002, "user_id": 2, "product_id": 102, "quantity": 2, "date": "2024-01-16"},
     {"id": 1003, "user_id": 1, "product_id": 103, "quantity": 1, "date": "2024-01-17"},
-]
+]), indexes=[HashIndex("user_id"), HashIndex("product_id"), SortedIndex("date")],
+   schema=ORDER_SCHEMA, backend=MEMORY_BACKEND, first_id=1001,
+   aggregates={"sales_by_category": GroupSum(_order_category, _order_amount),
+               "units_by_product": RankedSum(lambda order: order["product_id"],
+                                             lambda order: order["quantity"]),
+               # revenue and units per day/week/month and category/product
+               "sales_over_time": TimeRollup(
+                   lambda order: order["date"],
+                   groups={"category": _order_category, "product": _order_product},
+                   values={"revenue": _order_amount, "units": lambda order: order["quantity"]})})
+
+# Orders with user_name and product_name denormalized in, kept current on
+# renames and inserts, so get_user_orders needs no joins
+orders_view = JoinView(orders_db, {
+    "user_name": ("user_id", users_db, "name"),
+    "product_name": ("product_id", products_db, "name"),
+})
+
+# Serialized user:// and catalog:// resources, dropped by any write to their rows
+resource_cache = ResourceCache()
+
+def _invalidate_user_resource(op: str, pos: int, user: Optional[Dict], fields: Dict) -> None:
+    if op == "bulk_insert":
+        resource_cache.invalidate_prefix("user://")
+    else:
+        resource_cache.invalidate(f"user://{user['id']}")
+
+def _invalidate_catalog_resource(op: str, pos: int, product: Optional[Dict], fields: Dict) -> None:
+    if op == "bulk_insert" or (op == "update" and "category" in fields):
+        # the old category's listing changed too
+        resource_cache.invalidate_prefix("catalog://")
+    else:
+        resource_cache.invalidate(f"catalog://{product['category'].lower()}")
+
+users_db.subscribe(_invalidate_user_resource)
+products_db.subscribe(_invalidate_catalog_resource)
+
+if storage:
+    storage.attach(users_db, products_db, orders_db)
+    atexit.register(storage.close)
+
+# Pagination for list tools: without limit/cursor they return the full list as
+# before; with them they return {"items": [...], "next_cursor": "..." | null}
+MAX_PAGE_SIZE = 1000
+
+sql_tools = None
+if TOYDB_BACKEND == "sqlite":
+    from sqlite_backend import SQLiteDatabase, SQLiteTools
+    sql_db = SQLiteDatabase(os.environ.get("TOYDB_SQLITE_PATH", "toydb.sqlite"),
+                            readers=int(os.environ.get("TOYDB_SQLITE_READERS", "4")))
+    sql_db.load_if_empty({"users": users_db, "products": products_db, "orders": orders_db})
+    sql_db.subscribe("users", _invalidate_user_resource)
+    sql_db.subscribe("products", _invalidate_catalog_resource)
+    sql_tools = SQLiteTools(sql_db, MAX_PAGE_SIZE)
+    atexit.register(sql_db.close)
+
+# Append-only feed of inserts and updates (started after WAL replay, so it
+# only holds changes made by this server process), read with get_changes()
+change_feed = ChangeFeed(int(os.environ.get("TOYDB_CHANGEFEED_SIZE", "100000")))
+for _name, _table in (("users", users_db), ("products", products_db), ("orders", orders_db)):
+    if sql_tools:
+        sql_db.subscribe(_name, change_feed.listener(_name))
+    else:
+        _table.subscribe(change_feed.listener(_name))
+
+# Tools are registered with FastMCP as async handlers so one slow call does not
+# stall the event loop for every other client. Lock-free point lookups run on
+# the loop itself; writes (which may wait on row locks and WAL fsyncs) run on
+# the default thread pool; scans and analytics run on their own bounded pool,
+# so a burst of them cannot take the threads writes need. Change feed
+# long-polls, which park a thread for up to MAX_CHANGES_WAIT, get a pool of
+# their own for the same reason (beyond its size, further polls queue). The
+# tables stay in-process, which is why these are thread pools and not
+# process pools.
+ANALYTICS_POOL = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("TOYDB_ANALYTICS_WORKERS", "2")),
+    thread_name_prefix="analytics")
+LONG_POLL_POOL = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("TOYDB_LONG_POLL_WORKERS", "16")),
+    thread_name_prefix="long-poll")
+EXECUTORS = {"threads": None, "analytics": ANALYTICS_POOL, "long_poll": LONG_POLL_POOL}
+
+# Per-tool call counts, errors, latency histograms and sampled payload sizes
+metrics = Metrics(enabled=os.environ.get("TOYDB_METRICS", "1") != "0",
+                  payload_sample=int(os.environ.get("TOYDB_METRICS_PAYLOAD_SAMPLE", "16")))
+
+def _async(fn: Callable, run_in: str) -> Callable:
+    """Async version of a sync tool: run on the loop or in one of EXECUTORS"""
+    if run_in == "loop":
+        @functools.wraps(fn)
+        async def handler(*args, **kwargs):
+            return fn(*args, **kwargs)
+    else:
+        executor = EXECUTORS[run_in]
+
+        @functools.wraps(fn)
+        async def handler(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(executor, functools.partial(fn, *args, **kwargs))
+    return handler
+
+def tool(run_in: str = "analytics") -> Callable:
+    """Register a sync function as an async MCP tool; the sync function stays callable
+    in-process and its async version is available as fn.aio.
+
+    With the sqlite backend the same-named SQLiteTools method is served instead.
+    """
+    def decorator(fn: Callable) -> Callable:
+        impl = getattr(sql_tools, fn.__name__, None)
+        if impl is None:
+            impl = fn
+            mode = run_in
+        else:
+            if inspect.signature(impl) != inspect.signature(fn):
+                raise TypeError(f"SQLiteTools.{fn.__name__} does not match the tool signature")
+            impl = functools.wraps(fn)(functools.partial(impl))
+            # SQLite reads can touch disk, so nothing runs on the loop
+            mode = "threads" if run_in == "loop" else run_in
+        impl.aio = metrics.instrument(fn.__name__, _async(impl, mode))
+        mcp.tool()(impl.aio)
+        return impl
+    return decorator
+
+def resource(uri: str, run_in: str = "analytics") -> Callable:
+    """Register a sync function as an async MCP resource, like tool()"""
+    def decorator(fn: Callable) -> Callable:
+        fn.aio = metrics.instrument(uri, _async(fn, run_in))
+        mcp.resource(uri)(fn.aio)
+        return fn
+    return decorator
+
+def _paged(source, positions: Callable[[int], Iterator[int]],
+           limit: Optional[int], cursor: Optional[str],
+           predicate: Optional[Callable[[Dict], bool]] = None) -> Union[List[Dict], Dict]:
+    """Rows of a Table or JoinView at the given positions, paged if asked to"""
+    paginate = limit is not None or cursor is not None
+    if paginate:
+        limit = max(1, min(limit or MAX_PAGE_SIZE, MAX_PAGE_SIZE))
+    rows, next_cursor = page(positions(decode_cursor(cursor)), source.row_at, limit, predicate)
+    return {"items": rows, "next_cursor": next_cursor} if paginate else rows
 
 # User management tools
-@mcp.tool()
+@tool("loop")
 def get_user_by_id(user_id: int) -> Optional[Dict]:
     """Get user details by user ID"""
-    for user in users_db:
-        if user["id"] == user_id:
-            return user
-    return None
+    return users_db.get(user_id)
 
-@mcp.tool()
-def get_users_by_city(city: str) -> List[Dict]:
-    """Get all users from a specific city"""
-    return [user for user in users_db if user["city"].lower() == city.lower()]
+@tool()
+def get_users_by_city(city: str, limit: Optional[int] = None,
+                      cursor: Optional[str] = None) -> Union[List[Dict], Dict]:
+    """Get all users from a specific city (pass limit/cursor to page through them)"""
+    return _paged(users_db, lambda after: users_db.find_positions("city", city, after),
+                  limit, cursor)
 
-@mcp.tool()
+@tool("threads")
 def create_user(name: str, email: str, age: int, city: str) -> Dict:
     """Create a new user in the database"""
-    new_id = max(user["id"] for user in users_db) + 1
+    new_id = users_db.next_id()
     new_user = {
         "id": new_id,
         "name": name,
@@ -57,50 +267,57 @@ def create_user(name: str, email: str, age: int, city: str) -> Dict:
         "age": age,
         "city": city
     }
-    users_db.append(new_user)
+    users_db.insert(new_user)
     return new_user
 
+@tool("loop")
+def get_users_by_ids(user_ids: List[int]) -> List[Optional[Dict]]:
+    """Get several users by ID in one call, in input order (null for unknown IDs)"""
+    return users_db.get_many(user_ids)
+
 # Product management tools
-@mcp.tool()
+@tool("loop")
 def get_product_by_id(product_id: int) -> Optional[Dict]:
     """Get product details by product ID"""
-    for product in products_db:
-        if product["id"] == product_id:
-            return product
-    return None
-
-@mcp.tool()
-def get_products_by_category(category: str) -> List[Dict]:
-    """Get all products in a specific category"""
-    return [product for product in products_db 
-            if product["category"].lower() == category.lower()]
-
-@mcp.tool()
+    return products_db.get(product_id)
+
+@tool()
+def get_products_by_category(category: str, limit: Optional[int] = None,
+                             cursor: Optional[str] = None) -> Union[List[Dict], Dict]:
+    """Get all products in a specific category (pass limit/cursor to page through them)"""
+    return _paged(products_db, lambda after: products_db.find_positions("category", category, after),
+                  limit, cursor)
+
+@tool("threads")
 def update_product_stock(product_id: int, new_stock: int) -> Optional[Dict]:
     """Update the stock quantity of a product"""
-    for product in products_db:
-        if product["id"] == product_id:
-            product["stock"] = new_stock
-            return product
-    return None
+    with products_db.row_lock(product_id):
+        return products_db.update(product_id, stock=new_stock)
+
+@tool("loop")
+def get_products_by_ids(product_ids: List[int]) -> List[Optional[Dict]]:
+    """Get several products by ID in one call, in input order (null for unknown IDs)"""
+    return products_db.get_many(product_ids)
+
+@tool("threads")
+def update_products_stock(updates: List[Dict[str, int]]) -> List[Optional[Dict]]:
+    """Update the stock of several products at once.
+    Each update is {"product_id": ..., "new_stock": ...}; results are in input order, with
+    null for unknown products. A malformed update rejects the whole batch."""
+    check_batch(updates, ("product_id", "new_stock"))
+    with transaction(*(products_db.row_lock(update["product_id"]) for update in updates)):
+        return [update_product_stock(update["product_id"], update["new_stock"]) for update in updates]
 
 # Order management tools
-@mcp.tool()
-def get_user_orders(user_id: int) -> List[Dict]:
-    """Get all orders for a specific user"""
-    user_orders = []
-    for order in orders_db:
-        if order["user_id"] == user_id:
-            # Enrich order with user and product details
-            user = get_user_by_id(user_id)
-            product = get_product_by_id(order["product_id"])
-            enriched_order = order.copy()
-            enriched_order["user_name"] = user["name"] if user else "Unknown"
-            enriched_order["product_name"] = product["name"] if product else "Unknown"
-            user_orders.append(enriched_order)
-    return user_orders
-
-@mcp.tool()
+@tool()
+def get_user_orders(user_id: int, limit: Optional[int] = None,
+                    cursor: Optional[str] = None) -> Union[List[Dict], Dict]:
+    """Get all orders for a specific user (pass limit/cursor to page through them)"""
+    # Orders come from the materialized view, already enriched with user and product names
+    return _paged(orders_view, lambda after: orders_db.find_positions("user_id", user_id, after),
+                  limit, cursor)
+
+@tool("threads")
 def create_order(user_id: int, product_id: int, quantity: int) -> Optional[Dict]:
     """Create a new order"""
     # Check if user exists
@@ -108,24 +325,28 @@ def create_order(user_id: int, product_id: int, quantity: int) -> Optional[Dict]
     if not user:
         return None
     
-    # Check if product exists and has enough stock
-    product = get_product_by_id(product_id)
-    if not product or product["stock"] < quantity:
-        return None
-    
-    # Create order
-    new_id = max(order["id"] for order in orders_db) + 1 if orders_db else 1001
-    new_order = {
-        "id": new_id,
-        "user_id": user_id,
-        "product_id": product_id,
-        "quantity": quantity,
-        "date": datetime.now().strftime("%Y-%m-%d")
-    }
-    orders_db.append(new_order)
-    
-    # Update product stock
-    update_product_stock(product_id, product["stock"] - quantity)
+    # Reserve stock and insert the order atomically: the product's row lock
+    # makes the stock check and decrement one step, and both writes are
+    # logged as a single transaction
+    with transaction(products_db.row_lock(product_id)):
+        # Check if product exists and has enough stock
+        product = get_product_by_id(product_id)
+        if not product or product["stock"] < quantity:
+            return None
+        
+        # Create order
+        new_id = orders_db.next_id()
+        new_order = {
+            "id": new_id,
+            "user_id": user_id,
+            "product_id": product_id,
+            "quantity": quantity,
+            "date": datetime.now().strftime("%Y-%m-%d")
+        }
+        orders_db.insert(new_order)
+        
+        # Update product stock
+        update_product_stock(product_id, product["stock"] - quantity)
     
     # Enrich order with details
     enriched_order = new_order.copy()
@@ -135,50 +356,76 @@ def create_order(user_id: int, product_id: int, quantity: int) -> Optional[Dict]
     
     return enriched_order
 
+@tool("threads")
+def create_orders(orders: List[Dict[str, int]]) -> List[Optional[Dict]]:
+    """Create several orders at once.
+    Each order is {"user_id": ..., "product_id": ..., "quantity": ...}; results are
+    in input order, with null for orders that could not be placed. A malformed order
+    rejects the whole batch."""
+    check_batch(orders, ("user_id", "product_id", "quantity"))
+    with transaction(*(products_db.row_lock(order["product_id"]) for order in orders)):
+        return [create_order(order["user_id"], order["product_id"], order["quantity"])
+                for order in orders]
+
 # Analytics tools
-@mcp.tool()
+@tool()
 def get_sales_by_category() -> Dict:
     """Get total sales amount by product category"""
-    sales = {}
-    for order in orders_db:
-        product = get_product_by_id(order["product_id"])
-        if product:
-            category = product["category"]
-            amount = product["price"] * order["quantity"]
-            sales[category] = sales.get(category, 0) + amount
-    return sales
-
-@mcp.tool()
+    return orders_db.aggregates("sales_by_category")["sales_by_category"]
+
+@tool()
 def get_user_statistics() -> Dict:
     """Get statistics about users"""
-    total_users = len(users_db)
-    avg_age = sum(user["age"] for user in users_db) / total_users if total_users > 0 else 0
-    cities = {}
-    
-    for user in users_db:
-        cities[user["city"]] = cities.get(user["city"], 0) + 1
+    stats = users_db.aggregates()
+    total_users = stats["age"]["count"]
+    avg_age = stats["age"]["sum"] / total_users if total_users > 0 else 0
     
     return {
         "total_users": total_users,
         "average_age": round(avg_age, 2),
-        "users_by_city": cities
+        "users_by_city": stats["users_by_city"]
     }
 
 # Resource for user data
-@mcp.resource("user://{user_id}")
-def get_user_resource(user_id: str) -> str:
-    """Get user data as a resource"""
-    user = get_user_by_id(int(user_id))
+def _render_user(user_id: int) -> str:
+    user = get_user_by_id(user_id)
     if user:
         return json.dumps(user, indent=2)
     return f"User with ID {user_id} not found"
 
+@resource("user://{user_id}")
+def get_user_resource(user_id: str) -> str:
+    """Get user data as a resource"""
+    user_id = int(user_id)
+    return resource_cache.get(f"user://{user_id}", lambda: _render_user(user_id))[0]
+
 # Resource for product catalog
-@mcp.resource("catalog://{category}")
+def _render_catalog(category: str) -> str:
+    return json.dumps(get_products_by_category(category), indent=2)
+
+@resource("catalog://{category}")
 def get_catalog_resource(category: str) -> str:
     """Get product catalog by category"""
-    products = get_products_by_category(category)
-    return json.dumps(products, indent=2)
+    category = category.lower()
+    return resource_cache.get(f"catalog://{category}", lambda: _render_catalog(category))[0]
+
+@tool("threads")
+def get_resource_if_changed(uri: str, etag: Optional[str] = None) -> Dict:
+    """Read a user:// or catalog:// resource, skipping the content if it still matches etag.
+    Returns {"uri", "etag", "changed", "content"}; content is null when unchanged."""
+    scheme, _, key = uri.partition("://")
+    if scheme == "user":
+        user_id = int(key)
+        uri = f"user://{user_id}"
+        text, current = resource_cache.get(uri, lambda: _render_user(user_id))
+    elif scheme == "catalog":
+        category = key.lower()
+        uri = f"catalog://{category}"
+        text, current = resource_cache.get(uri, lambda: _render_catalog(category))
+    else:
+        raise ValueError(f"Unknown resource {uri!r}")
+    changed = current != etag
+    return {"uri": uri, "etag": current, "changed": changed, "content": text if changed else None}
 
 # Prompt templates
 @mcp.prompt()
@@ -204,36 +451,235 @@ Please generate a sales summary report including:
 1. Total revenue by product category
 2. Best selling products
 3. User demographics analysis
-4. Sales trends and insights
+4. Sales trends and insights (weekly and monthly, from get_sales_trends)
 5. Recommendations for inventory management and marketing
 
 Present the data with clear metrics and actionable insights.
 """
 
 # Utility tools
-@mcp.tool()
-def search_users(query: str) -> List[Dict]:
-    """Search users by name or email"""
+@tool()
+def search_users(query: str, limit: Optional[int] = None,
+                 cursor: Optional[str] = None) -> Union[List[Dict], Dict]:
+    """Search users by name, email or city (pass limit/cursor to page through results)"""
     query = query.lower()
-    results = []
-    for user in users_db:
-        if (query in user["name"].lower() or 
-            query in user["email"].lower() or 
-            query in user["city"].lower()):
-            results.append(user)
-    return results
-
-@mcp.tool()
-def get_low_stock_products(threshold: int = 10) -> List[Dict]:
-    """Get products with low stock (below threshold)"""
-    return [product for product in products_db if product["stock"] < threshold]
+
+    def matches(user: Dict) -> bool:
+        return (query in user["name"].lower() or 
+                query in user["email"].lower() or 
+                query in user["city"].lower())
+
+    return _paged(users_db, lambda after: users_db.candidate_positions("text", query, after),
+                  limit, cursor, predicate=matches)
+
+@tool()
+def get_low_stock_products(threshold: int = 10, limit: Optional[int] = None,
+                           cursor: Optional[str] = None) -> Union[List[Dict], Dict]:
+    """Get products with low stock (below threshold); pass limit/cursor to page through
+    them lowest stock first"""
+    if limit is None and cursor is None:
+        return products_db.range("stock", high=threshold - 1, insertion_order=True)
+    limit = max(1, min(limit or MAX_PAGE_SIZE, MAX_PAGE_SIZE))
+    # pages are read off the stock index; the cursor is the last (stock, position)
+    rows, next_key = products_db.range_page("stock", high=threshold - 1, limit=limit,
+                                            after=decode_key_cursor(cursor))
+    return {"items": rows, "next_cursor": encode_cursor(next_key) if next_key else None}
+
+# Range and top-k tools, served from sorted indexes in O(log n + k)
+def _clamp(limit: int) -> int:
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+@tool()
+def get_products_by_price_range(min_price: Optional[float] = None, max_price: Optional[float] = None,
+                                limit: int = 100) -> List[Dict]:
+    """Get products priced between min_price and max_price (inclusive), cheapest first"""
+    return products_db.range("price", min_price, max_price, _clamp(limit))
+
+@tool()
+def get_users_by_age_range(min_age: Optional[int] = None, max_age: Optional[int] = None,
+                           limit: int = 100) -> List[Dict]:
+    """Get users aged between min_age and max_age (inclusive), youngest first"""
+    return users_db.range("age", min_age, max_age, _clamp(limit))
+
+@tool()
+def get_orders_by_date_range(start_date: Optional[str] = None, end_date: Optional[str] = None,
+                             limit: int = 100) -> List[Dict]:
+    """Get orders placed between start_date and end_date (YYYY-MM-DD, inclusive), oldest first"""
+    return orders_db.range("date", start_date, end_date, _clamp(limit))
+
+@tool()
+def get_top_products(by: str = "price", k: int = 10, ascending: bool = False) -> List[Dict]:
+    """Get the k products with the highest (or, with ascending, lowest) price or stock"""
+    if by not in ("price", "stock"):
+        raise ValueError(f"Cannot rank products by {by!r}; use 'price' or 'stock'")
+    return products_db.range(by, limit=_clamp(k), descending=not ascending)
+
+@tool()
+def get_best_selling_products(k: int = 10) -> List[Dict]:
+    """Get the k products with the most units sold"""
+    best_sellers = []
+    for product_id, units in orders_db.top("units_by_product", _clamp(k)):
+        product = products_db.get(product_id)
+        best_sellers.append({
+            "product_id": product_id,
+            "name": product["name"] if product else "Unknown",
+            "units_sold": units,
+        })
+    return best_sellers
+
+# Sales trend tools, served from time-bucketed rollups instead of order scans
+SALES_DIMENSIONS = ("category", "product")
+
+@tool()
+def get_sales_trends(period: str = "month", by: str = "category",
+                     start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[Dict]:
+    """Get revenue and units sold per day, week (starting Monday) or month, in time order,
+    with a breakdown by product category or by product id. start_date/end_date (YYYY-MM-DD)
+    select the buckets overlapping that range. Served from rollups kept current on every order."""
+    if period not in PERIODS or by not in SALES_DIMENSIONS:
+        raise ValueError(f"period must be one of {PERIODS} and by one of {SALES_DIMENSIONS}")
+    trends = []
+    for bucket, groups in orders_db.series("sales_over_time", period, by, start_date, end_date):
+        trends.append({
+            "bucket": bucket,
+            "revenue": round(sum(totals["revenue"] for totals in groups.values()), 2),
+            "units": sum(totals["units"] for totals in groups.values()),
+            "groups": {group: {"revenue": round(totals["revenue"], 2), "units": totals["units"]}
+                       for group, totals in groups.items()},
+        })
+    return trends
+
+# Change feed tools
+CHANGES_URI = "changes://latest"
+MAX_CHANGES_WAIT = 30.0
+
+@tool("long_poll")
+def get_changes(after_seq: int = 0, limit: int = 100, tables: Optional[List[str]] = None,
+                wait_seconds: float = 0) -> Dict:
+    """Get inserts/updates (users, products, orders) with sequence number above after_seq.
+    Pass the returned next_seq as after_seq next time; wait_seconds (max 30) long-polls
+    for new changes. A changed epoch or truncated=true means changes were missed; a
+    "bulk_insert" entry (id null) stands for a whole import into that table."""
+    return change_feed.read(after_seq, _clamp(limit), tables,
+                            max(0.0, min(wait_seconds, MAX_CHANGES_WAIT)))
+
+@resource(CHANGES_URI, run_in="loop")
+def get_changes_resource() -> str:
+    """Latest change feed position; subscribe to it for change notifications"""
+    return json.dumps({"epoch": change_feed.epoch, "last_seq": change_feed.last_seq})
+
+# Sessions subscribed to changes://latest get notifications/resources/updated
+# (coalesced: one pending notification per session) and then call get_changes
+_change_subscribers: Dict = {}  # session -> [event loop, notification pending]
+
+@mcp._mcp_server.subscribe_resource()
+async def _subscribe(uri) -> None:
+    if str(uri) == CHANGES_URI:
+        session = mcp._mcp_server.request_context.session
+        _change_subscribers[session] = [asyncio.get_running_loop(), False]
+
+@mcp._mcp_server.unsubscribe_resource()
+async def _unsubscribe(uri) -> None:
+    if str(uri) == CHANGES_URI:
+        _change_subscribers.pop(mcp._mcp_server.request_context.session, None)
+
+async def _notify_change(session, state: list) -> None:
+    state[1] = False
+    try:
+        await session.send_resource_updated(AnyUrl(CHANGES_URI))
+    except Exception:
+        _change_subscribers.pop(session, None)  # client went away
+
+def _on_change(seq: int) -> None:
+    for session, state in list(_change_subscribers.items()):
+        if not state[1]:
+            state[1] = True
+            asyncio.run_coroutine_threadsafe(_notify_change(session, state), state[0])
+
+change_feed.watch(_on_change)
+
+# Bulk import/export tools. Clients can only name files inside TOYDB_BULK_DIR
+# (the tools are off without it); bulkio.py's command line takes any path.
+TABLES = {"users": users_db, "products": products_db, "orders": orders_db}
+BULK_DIR = os.environ.get("TOYDB_BULK_DIR")
+
+def _bulk_table(table: str) -> Table:
+    if table not in TABLES:
+        raise ValueError(f"Unknown table {table!r}; use one of {sorted(TABLES)}")
+    return TABLES[table]
+
+def _bulk_path(path: str) -> str:
+    """path resolved against TOYDB_BULK_DIR; refuses anything that ends up outside it"""
+    if not BULK_DIR:
+        raise PermissionError("Bulk import/export is disabled; set TOYDB_BULK_DIR to enable it")
+    root = os.path.realpath(BULK_DIR)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root or resolved == root:
+        raise PermissionError(f"{path!r} is outside the bulk data directory")
+    return resolved
+
+def import_file(table: str, path: str, format: Optional[str] = None) -> int:
+    """Bulk-load a file into a table of the active backend; returns the rows loaded"""
+    target = _bulk_table(table)
+    rows = bulkio.import_rows(path, target.schema, format)
+    if sql_tools:
+        return sql_db.insert_many(table, rows)
+    return target.bulk_insert(rows)
+
+def export_file(table: str, path: str, format: Optional[str] = None) -> int:
+    """Stream a table of the active backend to a file; returns the rows written"""
+    target = _bulk_table(table)
+    if sql_tools:
+        rows = sql_db.iter_rows(table)
+    else:
+        rows = (target.row_at(pos) for pos in range(len(target)))
+    return bulkio.export_rows(rows, target.schema, path, format)
+
+@tool("threads")
+def import_table(table: str, path: str, format: Optional[str] = None) -> Dict:
+    """Bulk-load rows (with ids) from a JSONL, CSV or Parquet file in the server's bulk
+    data directory into users, products or orders. The file is streamed and every row is
+    validated against the table schema; format defaults to the file extension. With the
+    sqlite backend an invalid row aborts the whole import, in memory the rows before it
+    are kept."""
+    return {"table": table, "path": path, "rows": import_file(table, _bulk_path(path), format)}
+
+@tool()
+def export_table(table: str, path: str, format: Optional[str] = None,
+                 overwrite: bool = False) -> Dict:
+    """Stream all rows of users, products or orders to a JSONL, CSV or Parquet file in the
+    server's bulk data directory (format defaults to the file extension)"""
+    resolved = _bulk_path(path)
+    if os.path.exists(resolved) and not overwrite:
+        raise FileExistsError(f"{path} exists; pass overwrite=true to replace it")
+    return {"table": table, "path": path, "rows": export_file(table, resolved, format)}
+
+# Server metrics
+@tool("loop")
+def get_server_metrics(format: str = "json") -> Union[Dict, str]:
+    """Get call counts, error counts, latency percentiles and payload sizes per tool.
+    format="prometheus" returns the Prometheus text exposition format instead."""
+    if format == "prometheus":
+        return metrics.prometheus()
+    return {"metrics_enabled": metrics.enabled, "tools": metrics.report()}
+
+@resource("metrics://prometheus", run_in="loop")
+def get_metrics_resource() -> str:
+    """Server metrics in the Prometheus text exposition format"""
+    return metrics.prometheus()
 
 if __name__ == "__main__":
     # Initialize with some sample data if needed
     print("Toy Database MCP Server started!")
     print("Available tools:")
-    print("- User management: get_user_by_id, get_users_by_city, create_user")
-    print("- Product management: get_product_by_id, get_products_by_category, update_product_stock")
-    print("- Order management: get_user_orders, create_order")
-    print("- Analytics: get_sales_by_category, get_user_statistics")
-    print("- Utilities: search_users, get_low_stock_products")
\ No newline at end of file
+    print("- User management: get_user_by_id, get_users_by_ids, get_users_by_city, create_user")
+    print("- Product management: get_product_by_id, get_products_by_ids, get_products_by_category, "
+          "update_product_stock, update_products_stock")
+    print("- Order management: get_user_orders, create_order, create_orders")
+    print("- Analytics: get_sales_by_category, get_user_statistics, get_best_selling_products, "
+          "get_sales_trends")
+    print("- Ranges: get_products_by_price_range, get_users_by_age_range, get_orders_by_date_range, "
+          "get_top_products")
+    print("- Utilities: search_users, get_low_stock_products, get_resource_if_changed, "
+          "get_changes, get_server_metrics")
+    print("- Bulk data: import_table, export_table")
\ No newline at end of file
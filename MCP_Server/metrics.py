@@ -0,0 +1,158 @@
+"""
+Per-tool instrumentation for the MCP server: call and error counts, a
+latency histogram and (sampled) response payload sizes.
+
+Each thread records into its own shard of counters, so the hot path takes
+no lock; snapshot() merges the shards when metrics are read. Payload sizes
+need a json.dumps of the result and are only measured on every
+`payload_sample`-th call of a tool.
+"""
+
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import bisect
+import functools
+import json
+import threading
+import time
+
+# Upper bounds of the latency buckets, in seconds (Prometheus "le" labels)
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Stats:
+    __slots__ = ("calls", "errors", "latency_sum", "buckets", "payload_calls", "payload_bytes")
+
+    def __init__(self, n_buckets: int):
+        self.calls = 0
+        self.errors = 0
+        self.latency_sum = 0.0
+        self.buckets = [0] * (n_buckets + 1)  # the last one is +Inf
+        self.payload_calls = 0
+        self.payload_bytes = 0
+
+    def merge(self, other: "_Stats") -> None:
+        self.calls += other.calls
+        self.errors += other.errors
+        self.latency_sum += other.latency_sum
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+        self.payload_calls += other.payload_calls
+        self.payload_bytes += other.payload_bytes
+
+
+class Metrics:
+    """Counters and latency histograms per tool/resource name"""
+
+    def __init__(self, enabled: bool = True, payload_sample: int = 16,
+                 buckets: tuple = LATENCY_BUCKETS):
+        self.enabled = enabled
+        self.payload_sample = max(1, payload_sample)
+        self.buckets = buckets
+        self._local = threading.local()
+        self._shards: List[Dict[str, _Stats]] = []
+        self._shards_lock = threading.Lock()
+
+    def _shard(self) -> Dict[str, _Stats]:
+        shard = getattr(self._local, "stats", None)
+        if shard is None:
+            shard = self._local.stats = {}
+            with self._shards_lock:
+                self._shards.append(shard)
+        return shard
+
+    def record(self, name: str, seconds: float, error: bool = False, result: Any = None) -> None:
+        shard = self._shard()
+        stats = shard.get(name)
+        if stats is None:
+            stats = shard[name] = _Stats(len(self.buckets))
+        stats.calls += 1
+        stats.errors += error
+        stats.latency_sum += seconds
+        stats.buckets[bisect.bisect_left(self.buckets, seconds)] += 1
+        if not error and stats.calls % self.payload_sample == 0:
+            payload = result if isinstance(result, str) else json.dumps(result, default=str)
+            stats.payload_calls += 1
+            stats.payload_bytes += len(payload)
+
+    def instrument(self, name: str, handler: Callable[..., Awaitable]) -> Callable[..., Awaitable]:
+        """Wrap an async tool/resource handler so each call is recorded under name"""
+        if not self.enabled:
+            return handler
+
+        @functools.wraps(handler)
+        async def instrumented(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = await handler(*args, **kwargs)
+            except Exception:
+                self.record(name, time.perf_counter() - start, error=True)
+                raise
+            self.record(name, time.perf_counter() - start, result=result)
+            return result
+        return instrumented
+
+    def snapshot(self) -> Dict[str, _Stats]:
+        with self._shards_lock:
+            shards = list(self._shards)
+        merged: Dict[str, _Stats] = {}
+        for shard in shards:
+            for name, stats in list(shard.items()):
+                merged.setdefault(name, _Stats(len(self.buckets))).merge(stats)
+        return merged
+
+    def _quantile_ms(self, stats: _Stats, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile (None if above the last bound)"""
+        target = q * stats.calls
+        seen = 0
+        for bound, count in zip(self.buckets, stats.buckets):
+            seen += count
+            if seen >= target:
+                return round(bound * 1000, 3)
+        return None
+
+    def report(self) -> Dict[str, Dict]:
+        """Per-name summary: counts, mean and bucketed p50/p95/p99 latency, mean payload"""
+        summary = {}
+        for name, stats in sorted(self.snapshot().items()):
+            summary[name] = {
+                "calls": stats.calls,
+                "errors": stats.errors,
+                "mean_ms": round(1000 * stats.latency_sum / stats.calls, 3) if stats.calls else None,
+                "p50_ms_le": self._quantile_ms(stats, 0.50),
+                "p95_ms_le": self._quantile_ms(stats, 0.95),
+                "p99_ms_le": self._quantile_ms(stats, 0.99),
+                "mean_payload_bytes": (stats.payload_bytes // stats.payload_calls
+                                       if stats.payload_calls else None),
+            }
+        return summary
+
+    def prometheus(self, prefix: str = "toydb") -> str:
+        """All metrics in the Prometheus text exposition format"""
+        stats_by_label = [('tool="' + name.replace("\\", "\\\\").replace('"', '\\"') + '"', stats)
+                          for name, stats in sorted(self.snapshot().items())]
+        lines = []
+
+        def family(metric: str, kind: str, help_text: str) -> None:
+            lines.append(f"# HELP {prefix}_{metric} {help_text}")
+            lines.append(f"# TYPE {prefix}_{metric} {kind}")
+
+        family("tool_calls_total", "counter", "MCP tool and resource calls")
+        for label, stats in stats_by_label:
+            lines.append(f"{prefix}_tool_calls_total{{{label}}} {stats.calls}")
+        family("tool_errors_total", "counter", "MCP tool and resource calls that raised")
+        for label, stats in stats_by_label:
+            lines.append(f"{prefix}_tool_errors_total{{{label}}} {stats.errors}")
+        family("tool_latency_seconds", "histogram", "MCP tool and resource latency")
+        for label, stats in stats_by_label:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), stats.buckets):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{prefix}_tool_latency_seconds_bucket{{{label},le="{le}"}} {cumulative}')
+            lines.append(f"{prefix}_tool_latency_seconds_sum{{{label}}} {stats.latency_sum}")
+            lines.append(f"{prefix}_tool_latency_seconds_count{{{label}}} {stats.calls}")
+        family("tool_payload_bytes", "summary", "Response size of sampled calls")
+        for label, stats in stats_by_label:
+            lines.append(f"{prefix}_tool_payload_bytes_sum{{{label}}} {stats.payload_bytes}")
+            lines.append(f"{prefix}_tool_payload_bytes_count{{{label}}} {stats.payload_calls}")
+        return "\n".join(lines) + "\n"
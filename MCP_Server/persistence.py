@@ -0,0 +1,311 @@
+"""
+Durable storage for the toy database: a write-ahead log plus SQLite snapshots.
+
+Every insert/update on an attached Table is appended to the WAL as one JSON
+line before the call returns. Snapshots copy all tables into a SQLite file
+and retire the WAL segments they cover; startup loads the latest snapshot
+and replays the WAL tail on top of it.
+
+WAL sync modes:
+- "always": fsync inside every append (one fsync per write)
+- "group":  a flusher thread fsyncs batches; writers wait for their batch
+- "none":   flush to the OS only, no fsync
+"""
+
+from contextlib import closing
+from typing import Dict, Iterable, Iterator, List, Optional
+import glob
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from toydb import transaction_gate
+
+SQL_TYPES = {int: "INTEGER", float: "REAL", str: "TEXT"}
+
+
+def _sql_type(kind: type) -> str:
+    for base, sql_type in SQL_TYPES.items():
+        if issubclass(kind, base):
+            return sql_type
+    return "TEXT"
+
+
+def _segment_path(directory: str, first_lsn: int) -> str:
+    return os.path.join(directory, f"wal-{first_lsn:012d}.log")
+
+
+def _segments(directory: str) -> List[str]:
+    return sorted(glob.glob(os.path.join(directory, "wal-*.log")))
+
+
+def fsync_directory(directory: str) -> None:
+    """Make renames, creations and deletions in a directory durable (POSIX only)"""
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def read_segment(path: str) -> Iterator[Dict]:
+    """Yield the records of one WAL segment.
+
+    A torn tail left by a crash (a partial or unterminated last line) is
+    truncated away so that later appends start on a clean line.
+    """
+    good_bytes = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            good_bytes += len(line)
+            yield record
+    if os.path.getsize(path) > good_bytes:
+        os.truncate(path, good_bytes)
+
+
+class WriteAheadLog:
+    """Append-only JSON-lines log with per-write or group-commit fsync"""
+
+    def __init__(self, directory: str, sync: str = "group", commit_delay: float = 0.0,
+                 last_lsn: int = 0):
+        if sync not in ("always", "group", "none"):
+            raise ValueError(f"Unknown WAL sync mode {sync!r}")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.sync = sync
+        self.commit_delay = commit_delay
+        self._lsn = last_lsn
+        self._durable_lsn = last_lsn
+        self._closed = False
+        self._cond = threading.Condition()
+        # held while an fsync is in flight so rotate/close never close its fd
+        self._sync_lock = threading.Lock()
+        self._file = open(_segment_path(directory, last_lsn + 1), "a", encoding="utf-8")
+        if sync != "none":
+            fsync_directory(directory)
+        self._flusher = None
+        if sync == "group":
+            self._flusher = threading.Thread(target=self._flush_loop, name="wal-flusher", daemon=True)
+            self._flusher.start()
+
+    @property
+    def last_lsn(self) -> int:
+        return self._lsn
+
+    def append(self, record: Dict) -> int:
+        """Write a record and return its log sequence number.
+
+        In "group" mode the record is not durable until wait(lsn) returns.
+        """
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Write-ahead log is closed")
+            self._lsn += 1
+            self._file.write(json.dumps({"lsn": self._lsn, **record}) + "\n")
+            if self.sync == "group":
+                self._cond.notify_all()
+            else:
+                # "always" fsyncs here; "none" still hands the record to the OS
+                # so a process crash (as opposed to a power loss) keeps it
+                self._sync_locked()
+            return self._lsn
+
+    def wait(self, lsn: int) -> None:
+        """Block until the record with this lsn has been fsynced"""
+        if self.sync != "group":
+            return
+        with self._cond:
+            while self._durable_lsn < lsn and not self._closed:
+                self._cond.wait()
+
+    def _sync_locked(self) -> None:
+        self._file.flush()
+        if self.sync != "none":
+            os.fsync(self._file.fileno())
+        self._durable_lsn = self._lsn
+
+    def _flush_loop(self) -> None:
+        while True:
+            with self._cond:
+                while self._durable_lsn == self._lsn and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+            if self.commit_delay:
+                # give concurrent writers a moment to join this batch
+                time.sleep(self.commit_delay)
+            with self._sync_lock:
+                with self._cond:
+                    if self._closed:
+                        return
+                    self._file.flush()
+                    batch_lsn = self._lsn
+                    fd = self._file.fileno()
+                # writers keep appending to the next batch while this one syncs
+                os.fsync(fd)
+                with self._cond:
+                    self._durable_lsn = max(self._durable_lsn, batch_lsn)
+                    self._cond.notify_all()
+
+    def rotate(self) -> int:
+        """Sync and close the current segment, start a new one; return the last lsn"""
+        with self._sync_lock, self._cond:
+            self._sync_locked()
+            self._file.close()
+            self._file = open(_segment_path(self.directory, self._lsn + 1), "a", encoding="utf-8")
+            if self.sync != "none":
+                fsync_directory(self.directory)
+            self._cond.notify_all()
+            return self._lsn
+
+    def close(self) -> None:
+        with self._sync_lock, self._cond:
+            if self._closed:
+                return
+            self._sync_locked()
+            self._file.close()
+            self._closed = True
+            self._cond.notify_all()
+        if self._flusher is not None:
+            self._flusher.join()
+
+
+class Storage:
+    """Snapshot + WAL persistence for a set of Tables in one data directory"""
+
+    SNAPSHOT = "snapshot.db"
+
+    def __init__(self, directory: str, sync: str = "group", snapshot_interval: float = 300,
+                 commit_delay: float = 0.0):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.sync = sync
+        self.snapshot_interval = snapshot_interval
+        self.commit_delay = commit_delay
+        self.tables: Dict[str, object] = {}
+        self.wal: Optional[WriteAheadLog] = None
+        self._snapshot_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._snapshot_lsn, self._sequences = self._read_meta()
+
+    @property
+    def snapshot_path(self) -> str:
+        return os.path.join(self.directory, self.SNAPSHOT)
+
+    def _connect(self, path: Optional[str] = None) -> sqlite3.Connection:
+        return sqlite3.connect(path or self.snapshot_path)
+
+    def _read_meta(self):
+        if not os.path.exists(self.snapshot_path):
+            return 0, {}
+        with closing(self._connect()) as conn:
+            lsn = conn.execute("SELECT value FROM meta WHERE key = 'lsn'").fetchone()[0]
+            sequences = dict(conn.execute("SELECT name, next_id FROM sequences"))
+        return int(lsn), sequences
+
+    def snapshot_rows(self, table: str, default: Iterable[Dict]) -> Iterable[Dict]:
+        """Rows of a table from the latest snapshot, or default if there is none"""
+        if not os.path.exists(self.snapshot_path):
+            return default
+        with closing(self._connect()) as conn:
+            conn.row_factory = sqlite3.Row
+            return [dict(row) for row in conn.execute(f'SELECT * FROM "{table}" ORDER BY rowid')]
+
+    def attach(self, *tables) -> None:
+        """Replay the WAL tail into the tables and start journaling their writes"""
+        for table in tables:
+            self.tables[table.name] = table
+            if table.name in self._sequences:
+                table.sequence.observe(self._sequences[table.name] - 1)
+        last_lsn = self._replay()
+        self.wal = WriteAheadLog(self.directory, self.sync, self.commit_delay, last_lsn)
+        for table in tables:
+            table.journal = self.wal
+        if not os.path.exists(self.snapshot_path):
+            # capture the seed rows so later runs do not depend on them
+            self.snapshot()
+        if self.snapshot_interval:
+            threading.Thread(target=self._snapshot_loop, name="snapshotter", daemon=True).start()
+
+    def _replay(self) -> int:
+        last_lsn = self._snapshot_lsn
+        for path in _segments(self.directory):
+            for record in read_segment(path):
+                if record["lsn"] <= self._snapshot_lsn:
+                    continue
+                for op in record["ops"] if record["op"] == "transaction" else [record]:
+                    self._apply(op)
+                last_lsn = record["lsn"]
+        return last_lsn
+
+    def _apply(self, record: Dict) -> None:
+        table = self.tables[record["table"]]
+        if record["op"] == "insert":
+            table.insert(record["row"])
+        else:
+            table.update(record["id"], **record["fields"])
+
+    def snapshot(self) -> int:
+        """Write all tables to the SQLite snapshot and drop covered WAL segments"""
+        with self._snapshot_lock:
+            tables = sorted(self.tables.values(), key=lambda table: table.name)
+            # wait out open transactions and hold every table lock so the
+            # copy and the WAL position agree
+            with transaction_gate.write():
+                for table in tables:
+                    table.lock.acquire()
+                try:
+                    lsn = self.wal.rotate()
+                    copies = {table.name: [dict(row) for row in table] for table in tables}
+                    sequences = {table.name: table.sequence.current for table in tables}
+                finally:
+                    for table in reversed(tables):
+                        table.lock.release()
+
+            tmp_path = self.snapshot_path + ".tmp"
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            with closing(self._connect(tmp_path)) as conn, conn:
+                conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value)")
+                conn.execute("INSERT INTO meta VALUES ('lsn', ?)", (lsn,))
+                conn.execute("CREATE TABLE sequences (name TEXT PRIMARY KEY, next_id INTEGER)")
+                conn.executemany("INSERT INTO sequences VALUES (?, ?)", sequences.items())
+                for table in tables:
+                    fields = list(table.schema)
+                    columns = ", ".join(
+                        f'"{field}" {_sql_type(kind)}' for field, kind in table.schema.items()
+                    )
+                    conn.execute(f'CREATE TABLE "{table.name}" ({columns})')
+                    conn.executemany(
+                        f'INSERT INTO "{table.name}" VALUES ({", ".join("?" * len(fields))})',
+                        ([row[field] for field in fields] for row in copies[table.name]),
+                    )
+            os.replace(tmp_path, self.snapshot_path)
+            # the new snapshot must be on disk before the segments it replaces go
+            fsync_directory(self.directory)
+            self._snapshot_lsn = lsn
+
+            current = _segment_path(self.directory, lsn + 1)
+            for path in _segments(self.directory):
+                if path < current:
+                    os.remove(path)
+            return lsn
+
+    def _snapshot_loop(self) -> None:
+        while not self._stop.wait(self.snapshot_interval):
+            self.snapshot()
+
+    def close(self) -> None:
+        self._stop.set()
+        if self.wal is not None:
+            self.wal.close()
@@ -0,0 +1,458 @@
+"""
+SQLite engine for the toy database (TOYDB_BACKEND=sqlite).
+
+The tables live in one SQLite file in WAL journal mode, so the dataset can
+outgrow RAM and readers never block the writer. Lookups, filters, ranges
+and joins run on indexes; writes go through a single writer connection in
+BEGIN IMMEDIATE transactions, reads through a pool of reader connections.
+All SQL is constant text with ? parameters, so every connection reuses its
+compiled (prepared) statements from sqlite3's statement cache.
+
+SQLiteTools implements the MCP tools of main.py with the same names and
+signatures; main.tool() serves them in place of the in-memory versions.
+"""
+
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Union
+import json
+import queue
+import sqlite3
+import threading
+
+from toydb import (PERIODS, check_batch, decode_cursor, decode_key_cursor, encode_cursor,
+                   period_bucket)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY, name TEXT NOT NULL, email TEXT NOT NULL,
+    age INTEGER NOT NULL, city TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS users_city ON users (city COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS users_age ON users (age);
+
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY, name TEXT NOT NULL, price REAL NOT NULL,
+    category TEXT NOT NULL, stock INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS products_category ON products (category COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS products_price ON products (price);
+CREATE INDEX IF NOT EXISTS products_stock ON products (stock);
+
+CREATE TABLE IF NOT EXISTS orders (
+    id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, product_id INTEGER NOT NULL,
+    quantity INTEGER NOT NULL, date TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS orders_user ON orders (user_id);
+CREATE INDEX IF NOT EXISTS orders_product ON orders (product_id, quantity);
+CREATE INDEX IF NOT EXISTS orders_date ON orders (date);
+
+-- units sold per product, kept by trigger so best sellers are an index read
+CREATE TABLE IF NOT EXISTS product_sales (
+    product_id INTEGER PRIMARY KEY, units INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS product_sales_units ON product_sales (units);
+CREATE TRIGGER IF NOT EXISTS orders_count_sales AFTER INSERT ON orders BEGIN
+    INSERT INTO product_sales VALUES (NEW.product_id, NEW.quantity)
+    ON CONFLICT (product_id) DO UPDATE SET units = units + excluded.units;
+END;
+
+-- revenue and units per day/week/month bucket and category/product, kept by
+-- trigger so sales trends are an index range read (weeks start on Monday)
+CREATE TABLE IF NOT EXISTS sales_rollup (
+    period TEXT NOT NULL, dimension TEXT NOT NULL, bucket TEXT NOT NULL, grp NOT NULL,
+    revenue REAL NOT NULL, units INTEGER NOT NULL,
+    PRIMARY KEY (period, dimension, bucket, grp)) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS orders_roll_up_sales AFTER INSERT ON orders BEGIN
+    INSERT INTO sales_rollup
+    SELECT b.period, d.dimension, b.bucket,
+           CASE d.dimension WHEN 'category' THEN p.category ELSE p.id END,
+           p.price * NEW.quantity, NEW.quantity
+    FROM products AS p,
+         (SELECT 'day' AS period, date(NEW.date) AS bucket
+          UNION ALL SELECT 'week', date(NEW.date, '-6 days', 'weekday 1')
+          UNION ALL SELECT 'month', strftime('%Y-%m', NEW.date)) AS b,
+         (SELECT 'category' AS dimension UNION ALL SELECT 'product') AS d
+    WHERE p.id = NEW.product_id AND b.bucket IS NOT NULL
+    ON CONFLICT (period, dimension, bucket, grp) DO UPDATE SET
+        revenue = revenue + excluded.revenue, units = units + excluded.units;
+END;
+
+-- trigram full-text index for substring search over users
+CREATE VIRTUAL TABLE IF NOT EXISTS users_text USING fts5(
+    name, email, city, content='users', content_rowid='id', tokenize='trigram');
+CREATE TRIGGER IF NOT EXISTS users_text_insert AFTER INSERT ON users BEGIN
+    INSERT INTO users_text (rowid, name, email, city)
+    VALUES (NEW.id, NEW.name, NEW.email, NEW.city);
+END;
+CREATE TRIGGER IF NOT EXISTS users_text_update AFTER UPDATE ON users BEGIN
+    INSERT INTO users_text (users_text, rowid, name, email, city)
+    VALUES ('delete', OLD.id, OLD.name, OLD.email, OLD.city);
+    INSERT INTO users_text (rowid, name, email, city)
+    VALUES (NEW.id, NEW.name, NEW.email, NEW.city);
+END;
+"""
+
+COLUMNS = {
+    "users": ("id", "name", "email", "age", "city"),
+    "products": ("id", "name", "price", "category", "stock"),
+    "orders": ("id", "user_id", "product_id", "quantity", "date"),
+}
+
+Listener = Callable[[str, int, Dict, Dict], None]
+
+
+class SQLiteDatabase:
+    """One writer connection plus a pool of reader connections on a WAL-mode file"""
+
+    def __init__(self, path: str, readers: int = 4):
+        self.path = path
+        self._write_lock = threading.RLock()
+        self._writer = self._connect()
+        self._writer.executescript(SCHEMA)
+        self._readers: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        for _ in range(readers):
+            self._readers.put(self._connect())
+        self._listeners: Dict[str, List[Listener]] = {}
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False,
+                               cached_statements=256)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        # inside a write transaction, read through the writer to see its own changes
+        if getattr(self._local, "depth", 0):
+            yield self._writer
+            return
+        conn = self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+
+    def query(self, sql: str, params: Iterable[Any] = ()) -> List[Dict]:
+        with self.reader() as conn:
+            return [dict(row) for row in conn.execute(sql, tuple(params))]
+
+    def query_one(self, sql: str, params: Iterable[Any] = ()) -> Optional[Dict]:
+        with self.reader() as conn:
+            row = conn.execute(sql, tuple(params)).fetchone()
+        return dict(row) if row is not None else None
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Write transaction on the writer connection; nested calls join the outer one.
+
+        Listeners are notified once the outermost transaction commits.
+        """
+        with self._write_lock:
+            depth = getattr(self._local, "depth", 0)
+            if depth == 0:
+                self._local.events = []
+                self._writer.execute("BEGIN IMMEDIATE")
+            self._local.depth = depth + 1
+            try:
+                yield self._writer
+            except BaseException:
+                self._local.depth = depth
+                if depth == 0:
+                    self._writer.execute("ROLLBACK")
+                raise
+            self._local.depth = depth
+            if depth:
+                return
+            self._writer.execute("COMMIT")
+            events, self._local.events = self._local.events, []
+        for table, op, row, fields in events:
+            for listener in self._listeners.get(table, ()):
+                listener(op, row["id"] if row else None, row, fields)
+
+    def notify(self, table: str, op: str, row: Dict, fields: Dict) -> None:
+        """Queue a change for the listeners of table (sent after commit)"""
+        self._local.events.append((table, op, row, fields))
+
+    def subscribe(self, table: str, listener: Listener) -> None:
+        """Call listener(op, id, row, changed_fields) after each committed insert/update.
+        insert_many is reported once, as op "bulk_insert" with id and row None and
+        changed_fields {"count": rows inserted}, like Table.bulk_insert."""
+        self._listeners.setdefault(table, []).append(listener)
+
+    def insert_many(self, table: str, rows: Iterable[Dict]) -> int:
+        """Bulk-insert rows with their ids, in one transaction (listeners get a single
+        bulk_insert event); returns the number inserted"""
+        columns = COLUMNS[table]
+        with self.transaction() as conn:
+            count = conn.executemany(
+                f"INSERT INTO {table} ({', '.join(columns)}) "
+                f"VALUES ({', '.join('?' * len(columns))})",
+                ([row[column] for column in columns] for row in rows),
+            ).rowcount
+            if count:
+                self.notify(table, "bulk_insert", None, {"count": count})
+        return count
+
+    def iter_rows(self, table: str, batch_size: int = 10000) -> Iterator[Dict]:
+        """Stream all rows of a table in id order, batch_size rows at a time"""
+        with self.reader() as conn:
+            cursor = conn.execute(f"SELECT {', '.join(COLUMNS[table])} FROM {table} ORDER BY id")
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    return
+                for row in batch:
+                    yield dict(row)
+
+    def load_if_empty(self, tables: Dict[str, Iterable[Dict]]) -> None:
+        """Copy rows into tables that have none yet (e.g. the seed data)"""
+        with self.transaction() as conn:
+            for name, rows in tables.items():
+                if not conn.execute(f"SELECT 1 FROM {name} LIMIT 1").fetchone():
+                    self.insert_many(name, rows)
+
+    def close(self) -> None:
+        self._writer.close()
+        while not self._readers.empty():
+            self._readers.get().close()
+
+
+def _fts_phrase(query: str) -> str:
+    return '"' + query.replace('"', '""') + '"'
+
+
+class SQLiteTools:
+    """The MCP tools of main.py, answered with SQL"""
+
+    def __init__(self, db: SQLiteDatabase, max_page_size: int = 1000):
+        self.db = db
+        self.max_page_size = max_page_size
+
+    def _clamp(self, limit: int) -> int:
+        return max(1, min(limit, self.max_page_size))
+
+    def _paged(self, sql: str, params: Iterable[Any], limit: Optional[int],
+               cursor: Optional[str]) -> Union[List[Dict], Dict]:
+        """Run a query ending in "<id> > ? ORDER BY <id> LIMIT ?" one page at a time"""
+        paginate = limit is not None or cursor is not None
+        if paginate:
+            limit = self._clamp(limit or self.max_page_size)
+        # one row of look-ahead tells whether there is a next page
+        rows = self.db.query(sql, (*params, decode_cursor(cursor), limit + 1 if paginate else -1))
+        if not paginate:
+            return rows
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]["id"])
+        return {"items": rows, "next_cursor": next_cursor}
+
+    def _by_ids(self, table: str, ids: List[int]) -> List[Optional[Dict]]:
+        rows = self.db.query(
+            f"SELECT t.* FROM json_each(?) AS j LEFT JOIN {table} AS t ON t.id = j.value "
+            "ORDER BY j.key", (json.dumps(ids),))
+        return [row if row["id"] is not None else None for row in rows]
+
+    # User management tools
+
+    def get_user_by_id(self, user_id: int) -> Optional[Dict]:
+        return self.db.query_one("SELECT * FROM users WHERE id = ?", (user_id,))
+
+    def get_users_by_city(self, city: str, limit: Optional[int] = None,
+                          cursor: Optional[str] = None) -> Union[List[Dict], Dict]:
+        return self._paged("SELECT * FROM users WHERE city = ? COLLATE NOCASE "
+                           "AND id > ? ORDER BY id LIMIT ?", (city,), limit, cursor)
+
+    def create_user(self, name: str, email: str, age: int, city: str) -> Dict:
+        with self.db.transaction() as conn:
+            new_id = conn.execute(
+                "INSERT INTO users (name, email, age, city) VALUES (?, ?, ?, ?)",
+                (name, email, age, city)).lastrowid
+            new_user = {"id": new_id, "name": name, "email": email, "age": age, "city": city}
+            self.db.notify("users", "insert", new_user, new_user)
+        return new_user
+
+    def get_users_by_ids(self, user_ids: List[int]) -> List[Optional[Dict]]:
+        return self._by_ids("users", user_ids)
+
+    # Product management tools
+
+    def get_product_by_id(self, product_id: int) -> Optional[Dict]:
+        return self.db.query_one("SELECT * FROM products WHERE id = ?", (product_id,))
+
+    def get_products_by_category(self, category: str, limit: Optional[int] = None,
+                                 cursor: Optional[str] = None) -> Union[List[Dict], Dict]:
+        return self._paged("SELECT * FROM products WHERE category = ? COLLATE NOCASE "
+                           "AND id > ? ORDER BY id LIMIT ?", (category,), limit, cursor)
+
+    def update_product_stock(self, product_id: int, new_stock: int) -> Optional[Dict]:
+        with self.db.transaction() as conn:
+            row = conn.execute("UPDATE products SET stock = ? WHERE id = ? RETURNING *",
+                               (new_stock, product_id)).fetchone()
+            if row is None:
+                return None
+            product = dict(row)
+            self.db.notify("products", "update", product, {"stock": new_stock})
+        return product
+
+    def get_products_by_ids(self, product_ids: List[int]) -> List[Optional[Dict]]:
+        return self._by_ids("products", product_ids)
+
+    def update_products_stock(self, updates: List[Dict[str, int]]) -> List[Optional[Dict]]:
+        check_batch(updates, ("product_id", "new_stock"))
+        with self.db.transaction():
+            return [self.update_product_stock(update["product_id"], update["new_stock"])
+                    for update in updates]
+
+    # Order management tools
+
+    def get_user_orders(self, user_id: int, limit: Optional[int] = None,
+                        cursor: Optional[str] = None) -> Union[List[Dict], Dict]:
+        return self._paged(
+            "SELECT o.*, COALESCE(u.name, 'Unknown') AS user_name, "
+            "COALESCE(p.name, 'Unknown') AS product_name FROM orders AS o "
+            "LEFT JOIN users AS u ON u.id = o.user_id "
+            "LEFT JOIN products AS p ON p.id = o.product_id "
+            "WHERE o.user_id = ? AND o.id > ? ORDER BY o.id LIMIT ?", (user_id,), limit, cursor)
+
+    def create_order(self, user_id: int, product_id: int, quantity: int) -> Optional[Dict]:
+        # BEGIN IMMEDIATE takes the write lock up front, so the stock check
+        # and the decrement cannot interleave with another order
+        with self.db.transaction() as conn:
+            user = conn.execute("SELECT name FROM users WHERE id = ?", (user_id,)).fetchone()
+            if user is None:
+                return None
+            product = conn.execute("SELECT * FROM products WHERE id = ?", (product_id,)).fetchone()
+            if product is None or product["stock"] < quantity:
+                return None
+            new_order = {
+                "user_id": user_id,
+                "product_id": product_id,
+                "quantity": quantity,
+                "date": datetime.now().strftime("%Y-%m-%d"),
+            }
+            new_order = {"id": conn.execute(
+                "INSERT INTO orders (user_id, product_id, quantity, date) VALUES (?, ?, ?, ?)",
+                tuple(new_order.values())).lastrowid, **new_order}
+            self.db.notify("orders", "insert", new_order, new_order)
+            self.update_product_stock(product_id, product["stock"] - quantity)
+        enriched_order = new_order.copy()
+        enriched_order["user_name"] = user["name"]
+        enriched_order["product_name"] = product["name"]
+        enriched_order["total_price"] = product["price"] * quantity
+        return enriched_order
+
+    def create_orders(self, orders: List[Dict[str, int]]) -> List[Optional[Dict]]:
+        check_batch(orders, ("user_id", "product_id", "quantity"))
+        with self.db.transaction():
+            return [self.create_order(order["user_id"], order["product_id"], order["quantity"])
+                    for order in orders]
+
+    # Analytics tools
+
+    def get_sales_by_category(self) -> Dict:
+        rows = self.db.query(
+            "SELECT p.category AS category, SUM(p.price * o.quantity) AS amount "
+            "FROM orders AS o JOIN products AS p ON p.id = o.product_id GROUP BY p.category")
+        return {row["category"]: row["amount"] for row in rows}
+
+    def get_user_statistics(self) -> Dict:
+        totals = self.db.query_one("SELECT COUNT(*) AS total, AVG(age) AS average FROM users")
+        by_city = self.db.query("SELECT city, COUNT(*) AS users FROM users GROUP BY city")
+        return {
+            "total_users": totals["total"],
+            "average_age": round(totals["average"] or 0, 2),
+            "users_by_city": {row["city"]: row["users"] for row in by_city},
+        }
+
+    # Utility tools
+
+    def search_users(self, query: str, limit: Optional[int] = None,
+                     cursor: Optional[str] = None) -> Union[List[Dict], Dict]:
+        if len(query) >= 3:
+            return self._paged(
+                "SELECT u.* FROM users_text AS t JOIN users AS u ON u.id = t.rowid "
+                "WHERE users_text MATCH ? AND t.rowid > ? ORDER BY t.rowid LIMIT ?",
+                (_fts_phrase(query),), limit, cursor)
+        # too short for trigrams: scan
+        pattern = "%" + query.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        return self._paged(
+            "SELECT * FROM users WHERE (lower(name) LIKE ?1 ESCAPE '\\' "
+            "OR lower(email) LIKE ?1 ESCAPE '\\' OR lower(city) LIKE ?1 ESCAPE '\\') "
+            "AND id > ?2 ORDER BY id LIMIT ?3", (pattern,), limit, cursor)
+
+    def get_low_stock_products(self, threshold: int = 10, limit: Optional[int] = None,
+                               cursor: Optional[str] = None) -> Union[List[Dict], Dict]:
+        if limit is None and cursor is None:
+            return self.db.query("SELECT * FROM products WHERE stock < ? ORDER BY id", (threshold,))
+        limit = self._clamp(limit or self.max_page_size)
+        # keyset paging in stock order on the stock index; the cursor is the last (stock, id)
+        after = decode_key_cursor(cursor) or (float("-inf"), 0)
+        rows = self.db.query(
+            "SELECT * FROM products WHERE stock < ? AND (stock, id) > (?, ?) "
+            "ORDER BY stock, id LIMIT ?", (threshold, *after, limit + 1))
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor([rows[-1]["stock"], rows[-1]["id"]])
+        return {"items": rows, "next_cursor": next_cursor}
+
+    def get_products_by_price_range(self, min_price: Optional[float] = None,
+                                    max_price: Optional[float] = None,
+                                    limit: int = 100) -> List[Dict]:
+        return self.db.query(
+            "SELECT * FROM products WHERE price BETWEEN ? AND ? ORDER BY price, id LIMIT ?",
+            (float("-inf") if min_price is None else min_price,
+             float("inf") if max_price is None else max_price, self._clamp(limit)))
+
+    def get_users_by_age_range(self, min_age: Optional[int] = None, max_age: Optional[int] = None,
+                               limit: int = 100) -> List[Dict]:
+        return self.db.query(
+            "SELECT * FROM users WHERE age BETWEEN ? AND ? ORDER BY age, id LIMIT ?",
+            (float("-inf") if min_age is None else min_age,
+             float("inf") if max_age is None else max_age, self._clamp(limit)))
+
+    def get_orders_by_date_range(self, start_date: Optional[str] = None,
+                                 end_date: Optional[str] = None,
+                                 limit: int = 100) -> List[Dict]:
+        return self.db.query(
+            "SELECT * FROM orders WHERE date BETWEEN ? AND ? ORDER BY date, id LIMIT ?",
+            (start_date or "", end_date or "\uffff", self._clamp(limit)))
+
+    def get_top_products(self, by: str = "price", k: int = 10,
+                         ascending: bool = False) -> List[Dict]:
+        if by not in ("price", "stock"):
+            raise ValueError(f"Cannot rank products by {by!r}; use 'price' or 'stock'")
+        order = "ASC" if ascending else "DESC"
+        return self.db.query(f"SELECT * FROM products ORDER BY {by} {order}, id {order} LIMIT ?",
+                             (self._clamp(k),))
+
+    def get_best_selling_products(self, k: int = 10) -> List[Dict]:
+        return self.db.query(
+            "SELECT s.product_id, COALESCE(p.name, 'Unknown') AS name, s.units AS units_sold "
+            "FROM product_sales AS s LEFT JOIN products AS p ON p.id = s.product_id "
+            "ORDER BY s.units DESC, s.product_id LIMIT ?", (self._clamp(k),))
+
+    def get_sales_trends(self, period: str = "month", by: str = "category",
+                         start_date: Optional[str] = None,
+                         end_date: Optional[str] = None) -> List[Dict]:
+        if period not in PERIODS or by not in ("category", "product"):
+            raise ValueError(f"period must be one of {PERIODS} and by one of ('category', 'product')")
+        low = period_bucket(period, start_date) if start_date else None
+        high = period_bucket(period, end_date) if end_date else None
+        rows = self.db.query(
+            "SELECT bucket, grp, revenue, units FROM sales_rollup "
+            "WHERE period = ? AND dimension = ? AND bucket >= ? AND bucket <= ? "
+            "ORDER BY bucket, grp", (period, by, low or "", high or "\uffff"))
+        trends: List[Dict] = []
+        for row in rows:
+            if not trends or trends[-1]["bucket"] != row["bucket"]:
+                trends.append({"bucket": row["bucket"], "revenue": 0, "units": 0, "groups": {}})
+            trend = trends[-1]
+            trend["revenue"] += row["revenue"]
+            trend["units"] += row["units"]
+            trend["groups"][row["grp"]] = {"revenue": round(row["revenue"], 2),
+                                           "units": row["units"]}
+        for trend in trends:
+            trend["revenue"] = round(trend["revenue"], 2)
+        return trends
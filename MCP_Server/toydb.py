@@ -0,0 +1,1077 @@
+"""
+In-memory table abstraction backing the toy database in main.py.
+Each table keeps an id -> row hash index in sync on every insert and update
+so primary-key lookups are O(1), plus optional secondary hash indexes for
+equality filters and running aggregates that are updated on every write.
+
+Rows are stored either as plain dicts ("rows" backend, the default) or
+column by column ("columns" backend): numeric fields in typed arrays, text
+in one UTF-8 buffer with offsets, and low-cardinality `Category` strings
+dictionary-encoded. The columnar backend keeps numeric columns in NumPy
+arrays when it is installed and falls back to the standard `array` module.
+"""
+
+from array import array
+from contextlib import ExitStack, contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import base64
+import bisect
+import datetime
+import json
+import sys
+import threading
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+class Category(str):
+    """Schema type for low-cardinality strings (cities, categories, dates)"""
+
+
+class HashIndex:
+    """Secondary index mapping a (normalized) field value to row positions.
+
+    Postings are kept sorted by storage position, i.e. insertion order,
+    which also gives paginated reads a stable order to resume from.
+    """
+
+    def __init__(self, field: str, normalize: Optional[Callable[[Any], Any]] = None):
+        self.name = field
+        self.fields = (field,)
+        self.field = field
+        self.normalize = normalize
+        self._postings: Dict[Any, List[int]] = {}
+
+    def key_for(self, value: Any) -> Any:
+        return self.normalize(value) if self.normalize else value
+
+    def add(self, pos: int, row: Dict) -> None:
+        positions = self._postings.setdefault(self.key_for(row[self.field]), [])
+        if not positions or positions[-1] < pos:
+            positions.append(pos)
+        else:
+            bisect.insort(positions, pos)
+
+    def remove(self, pos: int, row: Dict) -> None:
+        key = self.key_for(row[self.field])
+        positions = self._postings.get(key)
+        if positions is not None:
+            i = bisect.bisect_left(positions, pos)
+            if i < len(positions) and positions[i] == pos:
+                del positions[i]
+            if not positions:
+                del self._postings[key]
+
+    def positions(self, value: Any, after: int = -1) -> Iterator[int]:
+        """Positions of rows matching value, ascending, starting after `after`"""
+        positions = self._postings.get(self.key_for(value), [])
+        return (positions[i] for i in range(bisect.bisect_right(positions, after), len(positions)))
+
+
+class TrigramIndex:
+    """Inverted index from lowercase character trigrams to row positions.
+
+    Serves case-insensitive substring search over several text fields:
+    rows containing a query must contain all of its trigrams, so the
+    intersection of their posting sets is a superset of the matches.
+    """
+
+    def __init__(self, *fields: str, name: str = "text"):
+        self.name = name
+        self.fields = fields
+        self._postings: Dict[str, set] = {}
+
+    @staticmethod
+    def trigrams(text: str) -> set:
+        text = text.lower()
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    def _row_trigrams(self, row: Dict) -> set:
+        grams: set = set()
+        for field in self.fields:
+            grams |= self.trigrams(row[field])
+        return grams
+
+    def add(self, pos: int, row: Dict) -> None:
+        for gram in self._row_trigrams(row):
+            self._postings.setdefault(gram, set()).add(pos)
+
+    def remove(self, pos: int, row: Dict) -> None:
+        for gram in self._row_trigrams(row):
+            positions = self._postings.get(gram)
+            if positions is not None:
+                positions.discard(pos)
+                if not positions:
+                    del self._postings[gram]
+
+    def candidates(self, query: str) -> Optional[set]:
+        """Positions that may contain query, or None if it is too short to narrow down"""
+        grams = self.trigrams(query)
+        if not grams:
+            return None
+        postings = sorted((self._postings.get(gram, set()) for gram in grams), key=len)
+        positions = set(postings[0])
+        for other in postings[1:]:
+            positions &= other
+            if not positions:
+                break
+        return positions
+
+
+class SortedIndex:
+    """Index of (value, position) pairs in value order, for range and top-k reads.
+
+    A range is located with two binary searches and then read off in order,
+    so a query returning k rows costs O(log n + k).
+    """
+
+    def __init__(self, field: str, name: Optional[str] = None):
+        self.name = name or field
+        self.fields = (field,)
+        self.field = field
+        self._entries: List[Tuple[Any, int]] = []
+        self._deferred = False
+
+    def add(self, pos: int, row: Dict) -> None:
+        if self._deferred:
+            self._entries.append((row[self.field], pos))
+        else:
+            bisect.insort(self._entries, (row[self.field], pos))
+
+    @contextmanager
+    def bulk(self):
+        """Collect add()s unsorted and sort once at the end (for bulk loads)"""
+        self._deferred = True
+        try:
+            yield
+        finally:
+            self._deferred = False
+            self._entries.sort()
+
+    def remove(self, pos: int, row: Dict) -> None:
+        entry = (row[self.field], pos)
+        i = bisect.bisect_left(self._entries, entry)
+        if i < len(self._entries) and self._entries[i] == entry:
+            del self._entries[i]
+
+    def range(self, low: Any = None, high: Any = None, limit: Optional[int] = None,
+              descending: bool = False, after: Optional[Tuple[Any, int]] = None) -> List[int]:
+        """Positions of rows with low <= value <= high (None = unbounded), in value order.
+
+        `after` resumes an ascending read past the (value, position) entry it names.
+        """
+        entries = self._entries
+        start = 0 if low is None else bisect.bisect_left(entries, (low,))
+        if after is not None:
+            start = max(start, bisect.bisect_right(entries, after))
+        stop = len(entries) if high is None else bisect.bisect_right(entries, (high, float("inf")))
+        if limit is not None:
+            if descending:
+                start = max(start, stop - limit)
+            else:
+                stop = min(stop, start + limit)
+        selected = entries[start:stop]
+        if descending:
+            selected.reverse()
+        return [pos for _, pos in selected]
+
+
+class Sequence:
+    """Monotonic id generator; observe() keeps it ahead of explicitly given ids"""
+
+    def __init__(self, start: int = 1):
+        self._next = start
+        self._lock = threading.Lock()
+
+    @property
+    def current(self) -> int:
+        """The id the next call to next() will return"""
+        return self._next
+
+    def next(self) -> int:
+        with self._lock:
+            value = self._next
+            self._next += 1
+            return value
+
+    def observe(self, value: int) -> None:
+        with self._lock:
+            if value >= self._next:
+                self._next = value + 1
+
+
+class GroupCount:
+    """Running number of rows per value of a field"""
+
+    def __init__(self, field: str):
+        self.field = field
+        self._counts: Dict[Any, int] = {}
+
+    def add(self, row: Dict) -> None:
+        value = row[self.field]
+        self._counts[value] = self._counts.get(value, 0) + 1
+
+    def remove(self, row: Dict) -> None:
+        value = row[self.field]
+        self._counts[value] -= 1
+        if not self._counts[value]:
+            del self._counts[value]
+
+    def value(self) -> Dict[Any, int]:
+        return dict(self._counts)
+
+
+class FieldSum:
+    """Running sum and row count of a numeric field"""
+
+    def __init__(self, field: str):
+        self.field = field
+        self._sum = 0
+        self._count = 0
+
+    def add(self, row: Dict) -> None:
+        self._sum += row[self.field]
+        self._count += 1
+
+    def remove(self, row: Dict) -> None:
+        self._sum -= row[self.field]
+        self._count -= 1
+
+    def value(self) -> Dict[str, Any]:
+        return {"sum": self._sum, "count": self._count}
+
+
+class GroupSum:
+    """Running sum of value(row) per key(row); rows with a None key are skipped"""
+
+    def __init__(self, key: Callable[[Dict], Any], value: Callable[[Dict], Any]):
+        self.key = key
+        self.amount = value
+        self._sums: Dict[Any, Any] = {}
+
+    def add(self, row: Dict) -> None:
+        key = self.key(row)
+        if key is not None:
+            self._sums[key] = self._sums.get(key, 0) + self.amount(row)
+
+    def remove(self, row: Dict) -> None:
+        key = self.key(row)
+        if key is not None:
+            self._sums[key] -= self.amount(row)
+
+    def value(self) -> Dict[Any, Any]:
+        return dict(self._sums)
+
+
+class RankedSum(GroupSum):
+    """GroupSum that also keeps its groups ordered by total, for top-k reads"""
+
+    def __init__(self, key: Callable[[Dict], Any], value: Callable[[Dict], Any]):
+        super().__init__(key, value)
+        self._ranking: List[Tuple[Any, Any]] = []  # (-total, key), best first
+
+    def _move(self, key: Any, delta: Any) -> None:
+        old = self._sums.get(key)
+        if old is not None:
+            del self._ranking[bisect.bisect_left(self._ranking, (-old, key))]
+        self._sums[key] = total = (old or 0) + delta
+        bisect.insort(self._ranking, (-total, key))
+
+    def add(self, row: Dict) -> None:
+        key = self.key(row)
+        if key is not None:
+            self._move(key, self.amount(row))
+
+    def remove(self, row: Dict) -> None:
+        key = self.key(row)
+        if key is not None:
+            self._move(key, -self.amount(row))
+
+    def top(self, k: int) -> List[Tuple[Any, Any]]:
+        """The k groups with the largest totals, as (key, total) pairs"""
+        return [(key, -total) for total, key in self._ranking[:k]]
+
+
+PERIODS = ("day", "week", "month")
+
+
+def period_bucket(period: str, date: str) -> Optional[str]:
+    """Bucket of an ISO date for a period: the day itself, the Monday of its
+    week, or "YYYY-MM"; None for dates that do not parse"""
+    try:
+        day = datetime.date.fromisoformat(date)
+    except (TypeError, ValueError):
+        return None
+    if period == "day":
+        return day.isoformat()
+    if period == "week":
+        return (day - datetime.timedelta(days=day.weekday())).isoformat()
+    if period == "month":
+        return day.isoformat()[:7]
+    raise ValueError(f"Unknown period {period!r}; use one of {PERIODS}")
+
+
+class TimeRollup:
+    """Running totals of several values per time bucket and group.
+
+    Every row adds its values to one bucket per period (day, week, month)
+    and per group dimension, so reading a series of b buckets costs O(b)
+    however many rows went into it.
+    """
+
+    def __init__(self, date: Callable[[Dict], str], groups: Dict[str, Callable[[Dict], Any]],
+                 values: Dict[str, Callable[[Dict], Any]]):
+        self.date = date
+        self.groups = groups
+        self.values = values
+        # (period, dimension) -> bucket -> group -> totals in the order of values
+        self._totals: Dict[Tuple[str, str], Dict[str, Dict[Any, List]]] = {
+            (period, dimension): {} for period in PERIODS for dimension in groups}
+        self._buckets: Dict[str, Optional[Tuple[str, ...]]] = {}  # date -> bucket per period
+
+    def _buckets_of(self, date: str) -> Optional[Tuple[str, ...]]:
+        buckets = self._buckets.get(date, False)
+        if buckets is False:
+            buckets = self._buckets[date] = (None if period_bucket("day", date) is None else
+                                             tuple(period_bucket(p, date) for p in PERIODS))
+        return buckets
+
+    def _apply(self, row: Dict, sign: int) -> None:
+        buckets = self._buckets_of(self.date(row))
+        if buckets is None:
+            return
+        amounts = [sign * value(row) for value in self.values.values()]
+        for dimension, key in self.groups.items():
+            group = key(row)
+            if group is None:
+                continue
+            for period, bucket in zip(PERIODS, buckets):
+                groups = self._totals[period, dimension].setdefault(bucket, {})
+                totals = groups.get(group)
+                if totals is None:
+                    groups[group] = list(amounts)
+                else:
+                    for i, amount in enumerate(amounts):
+                        totals[i] += amount
+
+    def add(self, row: Dict) -> None:
+        self._apply(row, 1)
+
+    def remove(self, row: Dict) -> None:
+        self._apply(row, -1)
+
+    def series(self, period: str, dimension: str, start: Optional[str] = None,
+               end: Optional[str] = None) -> List[Tuple[str, Dict[Any, Dict[str, Any]]]]:
+        """(bucket, {group: {value name: total}}) pairs in time order, for the
+        buckets that overlap the dates start..end (None = unbounded)"""
+        buckets = self._totals[period, dimension]
+        low = period_bucket(period, start) if start else None
+        high = period_bucket(period, end) if end else None
+        names = list(self.values)
+        return [(bucket, {group: dict(zip(names, totals)) for group, totals in sorted(groups.items())})
+                for bucket, groups in sorted(buckets.items())
+                if (low is None or bucket >= low) and (high is None or bucket <= high)]
+
+    def value(self) -> Dict[str, Dict[str, List]]:
+        return {f"{period}/{dimension}": dict(self.series(period, dimension))
+                for period, dimension in self._totals}
+
+
+def _deep_sizeof(obj: Any, seen: set) -> int:
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_sizeof(k, seen) + _deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(_deep_sizeof(item, seen) for item in obj)
+    return size
+
+
+class RowStore:
+    """Row-oriented storage: one dict per row"""
+
+    def __init__(self, schema: Optional[Dict[str, type]] = None):
+        self._rows: List[Dict] = []
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def append(self, row: Dict) -> int:
+        self._rows.append(row)
+        return len(self._rows) - 1
+
+    def row(self, pos: int) -> Dict:
+        return self._rows[pos]
+
+    def value(self, pos: int, field: str) -> Any:
+        return self._rows[pos][field]
+
+    def set(self, pos: int, field: str, value: Any) -> None:
+        self._rows[pos][field] = value
+
+    def rows(self) -> Iterator[Dict]:
+        return iter(self._rows)
+
+    def nbytes(self) -> int:
+        return _deep_sizeof(self._rows, set())
+
+
+class _NumericColumn:
+    """Growable typed array of numbers"""
+
+    def __init__(self, typecode: str):
+        self._size = 0
+        if np is not None:
+            self._data = np.empty(16, dtype=np.dtype(typecode))
+        else:
+            self._data = array(typecode)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, value: Any) -> None:
+        if np is None:
+            self._data.append(value)
+        else:
+            if self._size == len(self._data):
+                grown = np.empty(2 * len(self._data), dtype=self._data.dtype)
+                grown[:self._size] = self._data
+                self._data = grown
+            self._data[self._size] = value
+        self._size += 1
+
+    def __getitem__(self, pos: int) -> Any:
+        return self._data[pos].item() if np is not None else self._data[pos]
+
+    def __setitem__(self, pos: int, value: Any) -> None:
+        self._data[pos] = value
+
+    def nbytes(self) -> int:
+        # both owning NumPy arrays and array.array report their buffer size
+        return sys.getsizeof(self._data)
+
+
+class _TextColumn:
+    """Strings packed into one UTF-8 buffer, addressed by start and length"""
+
+    def __init__(self):
+        self._data = bytearray()
+        self._starts = _NumericColumn("q")
+        self._lengths = _NumericColumn("I")
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def _pack(self, value: str):
+        encoded = value.encode("utf-8")
+        start = len(self._data)
+        self._data += encoded
+        return start, len(encoded)
+
+    def append(self, value: str) -> None:
+        start, length = self._pack(value)
+        self._starts.append(start)
+        self._lengths.append(length)
+
+    def __getitem__(self, pos: int) -> str:
+        start = self._starts[pos]
+        return self._data[start:start + self._lengths[pos]].decode("utf-8")
+
+    def __setitem__(self, pos: int, value: str) -> None:
+        # the old bytes are left behind; updates to text fields are rare
+        self._starts[pos], self._lengths[pos] = self._pack(value)
+
+    def nbytes(self) -> int:
+        return sys.getsizeof(self._data) + self._starts.nbytes() + self._lengths.nbytes()
+
+
+class _CategoryColumn:
+    """Dictionary-encoded string column: each distinct string is stored once"""
+
+    def __init__(self):
+        self.codes = _NumericColumn("I")
+        self.dictionary: List[str] = []
+        self._code_of: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def encode(self, value: str) -> int:
+        code = self._code_of.get(value)
+        if code is None:
+            code = len(self.dictionary)
+            value = sys.intern(value)
+            self.dictionary.append(value)
+            self._code_of[value] = code
+        return code
+
+    def append(self, value: str) -> None:
+        self.codes.append(self.encode(value))
+
+    def __getitem__(self, pos: int) -> str:
+        return self.dictionary[self.codes[pos]]
+
+    def __setitem__(self, pos: int, value: str) -> None:
+        self.codes[pos] = self.encode(value)
+
+    def nbytes(self) -> int:
+        seen: set = set()
+        return (self.codes.nbytes() + _deep_sizeof(self.dictionary, seen)
+                + _deep_sizeof(self._code_of, seen))
+
+
+class ColumnStore:
+    """Column-oriented storage: typed arrays for numbers, encoded strings"""
+
+    TYPECODES = {int: "q", float: "d"}
+
+    def __init__(self, schema: Optional[Dict[str, type]] = None):
+        if not schema:
+            raise ValueError("The columns backend needs a schema")
+        self._columns: Dict[str, Any] = {
+            field: self._column_for(kind) for field, kind in schema.items()
+        }
+
+    def _column_for(self, kind: type):
+        if issubclass(kind, Category):
+            return _CategoryColumn()
+        if issubclass(kind, str):
+            return _TextColumn()
+        return _NumericColumn(self.TYPECODES[kind])
+
+    def __len__(self) -> int:
+        return len(next(iter(self._columns.values())))
+
+    def append(self, row: Dict) -> int:
+        for field, column in self._columns.items():
+            column.append(row[field])
+        return len(self) - 1
+
+    def row(self, pos: int) -> Dict:
+        return {field: column[pos] for field, column in self._columns.items()}
+
+    def value(self, pos: int, field: str) -> Any:
+        return self._columns[field][pos]
+
+    def set(self, pos: int, field: str, value: Any) -> None:
+        self._columns[field][pos] = value
+
+    def rows(self) -> Iterator[Dict]:
+        return (self.row(pos) for pos in range(len(self)))
+
+    def nbytes(self) -> int:
+        return sum(column.nbytes() for column in self._columns.values())
+
+
+BACKENDS = {"rows": RowStore, "columns": ColumnStore}
+
+
+class RWLock:
+    """Reader/writer lock: many readers or one writer; waiting writers go first.
+
+    The write side is reentrant and also serves as a plain lock (`with lock:`,
+    acquire()/release()); a thread holding it may enter read() too.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer: Optional[int] = None  # ident of the thread holding the write side
+        self._depth = 0
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self):
+        if self._writer == threading.get_ident():
+            yield
+            return
+        with self._cond:
+            while self._writer is not None or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    def acquire(self) -> None:
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._depth += 1
+                return
+            self._writers_waiting += 1
+            while self._writer is not None or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = me
+            self._depth = 1
+
+    def release(self) -> None:
+        with self._cond:
+            self._depth -= 1
+            if not self._depth:
+                self._writer = None
+                self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def __enter__(self) -> "RWLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
+
+
+def encode_cursor(pos: Any) -> str:
+    """Opaque continuation token for a paginated read (a position or a sort key)"""
+    return base64.urlsafe_b64encode(json.dumps({"after": pos}).encode()).decode()
+
+
+def decode_cursor(cursor: Optional[str]) -> int:
+    """Position to resume after; -1 (start) for an empty cursor"""
+    if not cursor:
+        return -1
+    try:
+        return int(json.loads(base64.urlsafe_b64decode(cursor.encode()))["after"])
+    except (ValueError, KeyError, TypeError):
+        raise ValueError(f"Invalid cursor {cursor!r}") from None
+
+
+def decode_key_cursor(cursor: Optional[str]) -> Optional[Tuple[Any, int]]:
+    """(sort value, position or id) to resume after; None (start) for an empty cursor"""
+    if not cursor:
+        return None
+    try:
+        value, pos = json.loads(base64.urlsafe_b64decode(cursor.encode()))["after"]
+        return value, int(pos)
+    except (ValueError, KeyError, TypeError):
+        raise ValueError(f"Invalid cursor {cursor!r}") from None
+
+
+def check_batch(items: List[Dict], fields: Tuple[str, ...]) -> None:
+    """Raise ValueError unless every item has exactly these integer fields.
+
+    Batch tools call this before their first write, so a malformed item
+    rejects the whole batch instead of failing after earlier items were applied.
+    """
+    for number, item in enumerate(items):
+        if not isinstance(item, dict) or set(item) != set(fields):
+            raise ValueError(f"Item {number} must have exactly the fields {list(fields)}")
+        for field in fields:
+            if not isinstance(item[field], int) or isinstance(item[field], bool):
+                raise ValueError(f"Item {number}: {field} must be an integer")
+
+
+def page(positions: Iterable[int], fetch: Callable[[int], Dict], limit: Optional[int],
+         predicate: Optional[Callable[[Dict], bool]] = None) -> Tuple[List[Dict], Optional[str]]:
+    """Materialize at most `limit` rows (all if None) from an ascending position iterator.
+
+    Returns the rows and a cursor to pass back (through decode_cursor) as
+    `after` for the next page, or None when there are no more rows.
+    """
+    rows: List[Dict] = []
+    last_pos = -1
+    for pos in positions:
+        row = fetch(pos)
+        if predicate is not None and not predicate(row):
+            continue
+        if limit is not None and len(rows) == limit:
+            return rows, encode_cursor(last_pos)
+        rows.append(row)
+        last_pos = pos
+    return rows, None
+
+
+# Per-thread buffer of WAL records written inside a transaction() block
+_pending = threading.local()
+
+# Transactions hold this shared; snapshots take it exclusively so they
+# never capture half of a transaction
+transaction_gate = RWLock()
+
+
+@contextmanager
+def _acquired(locks):
+    # a fixed global order means overlapping lock sets cannot deadlock
+    ordered = sorted(set(locks), key=id)
+    for lock in ordered:
+        lock.acquire()
+    try:
+        yield
+    finally:
+        for lock in reversed(ordered):
+            lock.release()
+
+
+@contextmanager
+def transaction(*locks):
+    """Run a block while holding row locks, logging all its writes as one WAL record.
+
+    Locks come from Table.row_lock(). Nested transactions join the outer
+    one. The record is only written if the block completes. There is no
+    rollback, so the block must not raise after its first write: check
+    everything, then write. Writes made before an exception stay in memory
+    but are never logged, so a restart drops them rather than replaying a
+    half-applied transaction.
+    """
+    if getattr(_pending, "records", None) is not None:
+        with _acquired(locks):
+            yield
+        return
+    journal, lsn = None, None
+    with transaction_gate.read(), _acquired(locks):
+        _pending.records = []
+        try:
+            yield
+        except BaseException:
+            _pending.records = None
+            raise
+        records, _pending.records = _pending.records, None
+        if records:
+            journal = records[0][0]
+            lsn = journal.append({"op": "transaction", "ops": [record for _, record in records]})
+    if lsn is not None:
+        # wait after releasing the locks so other writers can join the fsync
+        journal.wait(lsn)
+
+
+class Table:
+    """Rows with a hash index on the primary key and optional secondary indexes"""
+
+    ROW_LOCK_STRIPES = 64
+
+    def __init__(self, name: str, rows: Iterable[Dict] = (), key: str = "id",
+                 indexes: Iterable[Any] = (), schema: Optional[Dict[str, type]] = None,
+                 backend: str = "rows", aggregates: Optional[Dict[str, Any]] = None,
+                 first_id: int = 1):
+        self.name = name
+        self.key = key
+        self.schema = schema
+        # `with lock:` serializes writes; lock.read() admits concurrent readers
+        self.lock = RWLock()
+        self.sequence = Sequence(first_id)
+        self.journal = None  # write-ahead log, set by persistence.Storage.attach
+        self._row_locks = [threading.RLock() for _ in range(self.ROW_LOCK_STRIPES)]
+        self._store = BACKENDS[backend](schema)
+        self._by_id: Dict[int, int] = {}  # primary key -> storage position
+        self._indexes: Dict[str, Any] = {index.name: index for index in indexes}
+        self._aggregates: Dict[str, Any] = dict(aggregates or {})
+        self._listeners: List[Callable[[str, int, Dict, Dict], None]] = []
+        self.bulk_insert(rows)
+
+    def __iter__(self) -> Iterator[Dict]:
+        return self._store.rows()
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+    def __contains__(self, row_id: int) -> bool:
+        return row_id in self._by_id
+
+    def get(self, row_id: int) -> Optional[Dict]:
+        """Return the row with the given primary key, or None"""
+        pos = self._by_id.get(row_id)
+        return None if pos is None else self._store.row(pos)
+
+    def get_many(self, row_ids: Iterable[int]) -> List[Optional[Dict]]:
+        """Rows for several primary keys in input order, None for unknown ids"""
+        positions = [self._by_id.get(row_id) for row_id in row_ids]
+        return [None if pos is None else self._store.row(pos) for pos in positions]
+
+    def insert(self, row: Dict) -> Dict:
+        """Append a row and add it to the indexes and aggregates"""
+        row_id = row[self.key]
+        with self.lock:
+            if row_id in self._by_id:
+                raise KeyError(f"Duplicate {self.key} {row_id} in table {self.name}")
+            pos = self._by_id[row_id] = self._store.append(row)
+            self.sequence.observe(row_id)
+            for index in self._indexes.values():
+                index.add(pos, row)
+            for aggregate in self._aggregates.values():
+                aggregate.add(row)
+            for listener in self._listeners:
+                listener("insert", pos, row, row)
+            lsn = self._log({"op": "insert", "row": row})
+        self._wait_durable(lsn)
+        return row
+
+    def bulk_insert(self, rows: Iterable[Dict]) -> int:
+        """Append many rows, then index and aggregate them in one pass; return the count.
+
+        Rows are consumed as a stream. If the iterable raises part-way (e.g. a
+        validation error), the rows appended so far are still indexed before
+        the error propagates. Listeners get one "bulk_insert" event for the
+        whole load rather than an "insert" per row (see subscribe).
+        """
+        lsn = None
+        with self.lock:
+            start = len(self._store)
+            try:
+                for row in rows:
+                    row_id = row[self.key]
+                    if row_id in self._by_id:
+                        raise KeyError(f"Duplicate {self.key} {row_id} in table {self.name}")
+                    self._by_id[row_id] = self._store.append(row)
+                    self.sequence.observe(row_id)
+                    lsn = self._log({"op": "insert", "row": row}) or lsn
+            finally:
+                stop = len(self._store)
+                with ExitStack() as stack:
+                    for index in self._indexes.values():
+                        if hasattr(index, "bulk"):
+                            stack.enter_context(index.bulk())
+                    for pos in range(start, stop):
+                        row = self._store.row(pos)
+                        for index in self._indexes.values():
+                            index.add(pos, row)
+                        for aggregate in self._aggregates.values():
+                            aggregate.add(row)
+                if stop > start:
+                    for listener in self._listeners:
+                        listener("bulk_insert", start, None, {"count": stop - start})
+        self._wait_durable(lsn)
+        return stop - start
+
+    def next_id(self) -> int:
+        """Allocate a fresh primary key in O(1)"""
+        return self.sequence.next()
+
+    def update(self, row_id: int, **fields) -> Optional[Dict]:
+        """Update fields of an existing row in place"""
+        with self.lock:
+            pos = self._by_id.get(row_id)
+            if pos is None:
+                return None
+            if self.key in fields and fields[self.key] != row_id:
+                raise ValueError(f"Cannot change {self.key} of a row in table {self.name}")
+            old_row = dict(self._store.row(pos))
+            for field, value in fields.items():
+                self._store.set(pos, field, value)
+            row = self._store.row(pos)
+            for index in self._indexes.values():
+                if any(field in fields for field in index.fields):
+                    index.remove(pos, old_row)
+                    index.add(pos, row)
+            for aggregate in self._aggregates.values():
+                aggregate.remove(old_row)
+                aggregate.add(row)
+            for listener in self._listeners:
+                listener("update", pos, row, fields)
+            lsn = self._log({"op": "update", "id": row_id, "fields": fields})
+        self._wait_durable(lsn)
+        return row
+
+    def subscribe(self, listener: Callable[[str, int, Dict, Dict], None]) -> None:
+        """Call listener(op, pos, row, changed_fields) after every insert/update.
+
+        A bulk_insert is reported once, as op "bulk_insert" with pos the first
+        new position, row None and changed_fields {"count": rows appended}, so
+        a large load does not flood listeners with per-row events.
+        Listeners run with the table lock held, in write order; keep them short.
+        """
+        self._listeners.append(listener)
+
+    def row_at(self, pos: int) -> Dict:
+        """Row at a storage position, as yielded by the *_positions() iterators"""
+        return self._store.row(pos)
+
+    def value_at(self, pos: int, field: str) -> Any:
+        """One field of the row at a storage position, without building the row"""
+        return self._store.value(pos, field)
+
+    def row_lock(self, row_id: int) -> threading.RLock:
+        """Lock guarding read-modify-write cycles on one row (striped by id)"""
+        return self._row_locks[hash(row_id) % self.ROW_LOCK_STRIPES]
+
+    def _log(self, record: Dict) -> Optional[int]:
+        # called with the lock held so the log order matches the apply order
+        if self.journal is None:
+            return None
+        record = {"table": self.name, **record}
+        pending = getattr(_pending, "records", None)
+        if pending is not None:
+            # serialize now: the row dict may change before the transaction commits
+            pending.append((self.journal, json.loads(json.dumps(record))))
+            return None
+        return self.journal.append(record)
+
+    def _wait_durable(self, lsn: Optional[int]) -> None:
+        # called after releasing the lock so concurrent writers share an fsync
+        if lsn is not None:
+            self.journal.wait(lsn)
+
+    def find_positions(self, field: str, value: Any, after: int = -1) -> Iterator[int]:
+        return self._indexes[field].positions(value, after)
+
+    def candidate_positions(self, index: str, query: str, after: int = -1) -> Iterator[int]:
+        with self.lock.read():
+            positions = self._indexes[index].candidates(query)
+            if positions is None:
+                return iter(range(after + 1, len(self)))
+            return iter(sorted(pos for pos in positions if pos > after))
+
+    def aggregates(self, *names: str) -> Dict[str, Any]:
+        """Consistent snapshot of the named running aggregates (all by default), by name"""
+        with self.lock.read():
+            return {name: aggregate.value() for name, aggregate in self._aggregates.items()
+                    if not names or name in names}
+
+    def top(self, aggregate: str, k: int) -> List[Tuple[Any, Any]]:
+        """Top k (group, total) pairs of a RankedSum aggregate"""
+        with self.lock.read():
+            return self._aggregates[aggregate].top(k)
+
+    def series(self, aggregate: str, period: str, dimension: str, start: Optional[str] = None,
+               end: Optional[str] = None) -> List[Tuple[str, Dict[Any, Dict[str, Any]]]]:
+        """Time series of a TimeRollup aggregate, see TimeRollup.series"""
+        with self.lock.read():
+            return self._aggregates[aggregate].series(period, dimension, start, end)
+
+    def range_positions(self, index: str, low: Any = None, high: Any = None,
+                        limit: Optional[int] = None, descending: bool = False) -> List[int]:
+        return self._indexes[index].range(low, high, limit, descending)
+
+    def range(self, index: str, low: Any = None, high: Any = None,
+              limit: Optional[int] = None, descending: bool = False,
+              insertion_order: bool = False) -> List[Dict]:
+        """Rows with low <= value <= high on a SortedIndex, in value order, at most limit;
+        with insertion_order the selected rows come back in table order instead"""
+        with self.lock.read():
+            positions = self.range_positions(index, low, high, limit, descending)
+        if insertion_order:
+            positions.sort()
+        return [self._store.row(pos) for pos in positions]
+
+    def range_page(self, index: str, low: Any = None, high: Any = None,
+                   limit: Optional[int] = None, after: Optional[Tuple[Any, int]] = None
+                   ) -> Tuple[List[Dict], Optional[Tuple[Any, int]]]:
+        """One page of range() in ascending order, resuming after the (value, position)
+        key `after`; returns the rows and the key to resume from, None on the last page"""
+        sorted_index = self._indexes[index]
+        with self.lock.read():
+            # one entry of look-ahead tells whether there is a next page
+            positions = sorted_index.range(low, high, None if limit is None else limit + 1,
+                                           after=after)
+            more = limit is not None and len(positions) > limit
+            rows = [self._store.row(pos) for pos in positions[:limit]]
+            next_key = (rows[-1][sorted_index.field], positions[limit - 1]) if more else None
+        return rows, next_key
+
+    def memory_usage(self) -> int:
+        """Approximate bytes held by the row storage (indexes excluded)"""
+        return self._store.nbytes()
+
+
+class JoinView:
+    """Materialized view of a table's rows with fields copied from referenced rows.
+
+    `joins` maps a view field to (foreign key field in base, referenced
+    table, referenced field), e.g. {"user_name": ("user_id", users, "name")}.
+    The view follows inserts and updates on the base table and on every
+    referenced table, so reads need no joins. Only the joined values are
+    stored (shared between rows that have the same value); the base fields
+    come from the base table. The base table must have a HashIndex on each
+    foreign key field.
+    """
+
+    def __init__(self, base: Table, joins: Dict[str, Tuple[str, Table, str]],
+                 missing: Any = "Unknown"):
+        self.base = base
+        self.joins = joins
+        self.missing = missing
+        # only the joined values are kept, one list per view field indexed by
+        # base storage position; row_at reads everything else from the base
+        self._joined: Dict[str, List[Any]] = {view_field: [] for view_field in joins}
+        self._values: Dict[Any, Any] = {}  # one shared object per distinct joined value
+        self._lock = threading.Lock()
+        with base.lock:
+            base.subscribe(self._on_base_change)
+            if len(base):
+                self._on_base_change("bulk_insert", 0, None, {"count": len(base)})
+        for view_field, (foreign_key, table, field) in joins.items():
+            table.subscribe(self._referenced_listener(view_field, foreign_key, table, field))
+
+    BULK_CHUNK = 10000  # base positions looked up per view-lock hold on a bulk load
+
+    def _shared(self, value: Any) -> Any:
+        return self._values.setdefault(value, value)
+
+    def _on_base_change(self, op: str, pos: int, row: Optional[Dict], fields: Dict) -> None:
+        if op == "update" and not any(foreign_key in fields
+                                      for foreign_key, _, _ in self.joins.values()):
+            return
+        if op != "bulk_insert":
+            self._join(range(pos, pos + 1), lambda _, foreign_key: row[foreign_key])
+            return
+        # a bulk load is read off the base columns a chunk at a time, so the
+        # view never holds more than BULK_CHUNK looked-up values in flight
+        stop = pos + fields["count"]
+        for start in range(pos, stop, self.BULK_CHUNK):
+            self._join(range(start, min(start + self.BULK_CHUNK, stop)), self.base.value_at)
+
+    def _join(self, positions: range, foreign_key_at: Callable[[int, str], Any]) -> None:
+        # looked up under the view lock so a concurrent rename cannot be lost
+        with self._lock:
+            for view_field, (foreign_key, table, field) in self.joins.items():
+                joined = []
+                for pos in positions:
+                    referenced = table.get(foreign_key_at(pos, foreign_key))
+                    joined.append(self._shared(referenced[field] if referenced else self.missing))
+                values = self._joined[view_field]
+                if positions.start > len(values):
+                    values.extend([self.missing] * (positions.start - len(values)))
+                # one slice assignment: readers see all of the new values or none
+                values[positions.start:positions.stop] = joined
+
+    def _referenced_listener(self, view_field: str, foreign_key: str, table: Table, field: str):
+        def listener(op: str, pos: int, row: Optional[Dict], fields: Dict) -> None:
+            if op == "bulk_insert":
+                changed = ((table.value_at(p, table.key), table.value_at(p, field))
+                           for p in range(pos, pos + fields["count"]))
+            elif field in fields:
+                changed = [(row[table.key], row[field])]
+            else:
+                return
+            values = self._joined[view_field]
+            with self._lock:
+                for row_id, value in changed:
+                    value = self._shared(value)
+                    for base_pos in self.base.find_positions(foreign_key, row_id):
+                        if base_pos < len(values):
+                            values[base_pos] = value
+        return listener
+
+    def row_at(self, pos: int) -> Dict:
+        """View row for a base storage position"""
+        row = dict(self.base.row_at(pos))  # the rows backend hands out its stored dict
+        try:
+            joined = {view_field: values[pos] for view_field, values in self._joined.items()}
+        except IndexError:
+            # the base table publishes a new position in its indexes before its
+            # listeners (and so this view) run; its write lock covers both, so
+            # once a read lock is granted the view has caught up
+            with self.base.lock.read():
+                joined = {view_field: values[pos] for view_field, values in self._joined.items()}
+        row.update(joined)
+        return row
+
+    def memory_usage(self) -> int:
+        """Approximate bytes held by the view on top of its base table"""
+        return (sum(sys.getsizeof(values) for values in self._joined.values())
+                + sys.getsizeof(self._values) + sum(map(sys.getsizeof, self._values)))